@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Running aggregates that absorb new rows one batch at a time
+
+RunningMoments keeps row counts plus per-column sums and non-missing counts,
+optionally per group, so means (cluster_stats, response rates) can be updated
+with O(batch) work when rows are ingested. CohortCube does the same (plus
+sums of squares) over several dimensions at once for KPI and population
+comparisons. ``updated`` returns a new object, so readers never see a
+half-applied batch.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class RunningMoments:
+
+    def __init__(self, columns, group_column=None, sums=None, counts=None, sizes=None):
+        self.columns = list(columns)
+        self.group_column = group_column
+        self.sums = sums if sums is not None else pd.DataFrame(columns=self.columns, dtype=float)
+        self.counts = counts if counts is not None else pd.DataFrame(columns=self.columns, dtype=float)
+        self.sizes = sizes if sizes is not None else pd.Series(dtype=float)
+
+    @classmethod
+    def from_frame(cls, df, columns, group_column=None):
+        return cls(columns, group_column).updated(df)
+
+    def _grouped(self, df):
+        values = df[self.columns].apply(pd.to_numeric, errors='coerce')
+        keys = df[self.group_column].to_numpy() if self.group_column else pd.Series('All', index=df.index)
+        return values.groupby(keys, observed=True)
+
+    def updated(self, batch):
+        """A copy with ``batch``'s rows added."""
+        grouped = self._grouped(batch)
+        return RunningMoments(
+            self.columns, self.group_column,
+            sums=self.sums.add(grouped.sum(), fill_value=0).sort_index(),
+            counts=self.counts.add(grouped.count(), fill_value=0).sort_index(),
+            sizes=self.sizes.add(grouped.size(), fill_value=0).sort_index(),
+        )
+
+    def means(self):
+        """Per-group means of every column (a single 'All' row when ungrouped)."""
+        return self.sums / self.counts
+
+    def size(self):
+        return int(self.sizes.sum())
+
+    def mean(self, column):
+        """Overall mean of ``column`` across groups."""
+        count = self.counts[column].sum()
+        return self.sums[column].sum() / count if count else float('nan')
+
+
+class CohortCube:
+    """Row counts plus per-measure non-missing counts, sums and sums of squares for every
+    cell of the cohort dimensions.
+
+    ``dimensions`` maps each dimension column to the key used for rows without
+    one (a batch may lack the column entirely, e.g. bank rows have no
+    Income_Level). Cells are rows of one small array, so a count, mean or
+    standard deviation over any slice costs O(cells) however many rows went in.
+    """
+
+    def __init__(self, dimensions, measures, cells=None, table=None):
+        self.dimensions = dict(dimensions)
+        self.measures = list(measures)
+        self.cells = cells if cells is not None else {}  # key tuple -> row of ``table``
+        # Columns: rows, then non-missing counts, sums and sums of squares of each measure
+        self.table = table if table is not None else np.zeros((0, 1 + 3 * len(self.measures)))
+        keys = list(self.cells)
+        self._keys = {name: np.array([key[i] for key in keys], dtype=object)
+                      for i, name in enumerate(self.dimensions)}
+
+    @classmethod
+    def from_frame(cls, df, dimensions, measures):
+        return cls(dimensions, measures).updated(df)
+
+    def _aggregate(self, batch):
+        # One code per row across all dimensions (mixed radix over each dimension's values)
+        combined = np.zeros(len(batch), dtype=np.int64)
+        levels = []
+        for name, missing in self.dimensions.items():
+            if name in batch:
+                codes, uniques = pd.factorize(batch[name])
+                uniques = pd.Index(uniques).tolist() + [missing]
+                codes = np.where(codes < 0, len(uniques) - 1, codes)
+            else:
+                codes, uniques = np.zeros(len(batch), dtype=np.int64), [missing]
+            combined = combined * len(uniques) + codes
+            levels.append(uniques)
+        cell_codes, inverse = np.unique(combined, return_inverse=True)
+
+        part = np.zeros((len(cell_codes), self.table.shape[1]))
+        part[:, 0] = np.bincount(inverse, minlength=len(cell_codes))
+        n = len(self.measures)
+        for i, measure in enumerate(self.measures):
+            if measure not in batch:
+                continue
+            values = pd.to_numeric(batch[measure], errors='coerce').to_numpy(dtype=float)
+            present = ~np.isnan(values)
+            values = np.where(present, values, 0.0)
+            part[:, 1 + i] = np.bincount(inverse, weights=present, minlength=len(cell_codes))
+            part[:, 1 + n + i] = np.bincount(inverse, weights=values, minlength=len(cell_codes))
+            part[:, 1 + 2 * n + i] = np.bincount(inverse, weights=values * values, minlength=len(cell_codes))
+
+        keys = []
+        for code in cell_codes.tolist():
+            key = []
+            for uniques in reversed(levels):
+                code, digit = divmod(code, len(uniques))
+                key.append(uniques[digit])
+            keys.append(tuple(reversed(key)))
+        return keys, part
+
+    def updated(self, batch):
+        """A copy with ``batch``'s rows added."""
+        keys, part = self._aggregate(batch)
+        cells = dict(self.cells)
+        rows = [cells.setdefault(key, len(cells)) for key in keys]
+        table = np.zeros((len(cells), self.table.shape[1]))
+        table[:len(self.table)] = self.table
+        table[rows] += part
+        return CohortCube(self.dimensions, self.measures, cells, table)
+
+    # Rollups ---------------------------------------------------------------
+
+    def _rows(self, where):
+        mask = np.ones(len(self.table), dtype=bool)
+        for name, value in where.items():
+            keys = self._keys[name]
+            mask &= np.isin(keys, list(value)) if isinstance(value, (list, tuple, set)) else keys == value
+        return mask
+
+    def size(self, **where):
+        """Rows in the cells matching ``where`` (dimension=value or dimension=[values])."""
+        return int(self.table[self._rows(where), 0].sum())
+
+    def mean(self, measure, **where):
+        i = self.measures.index(measure)
+        totals = self.table[self._rows(where)].sum(axis=0)
+        count = totals[1 + i]
+        return totals[1 + len(self.measures) + i] / count if count else float('nan')
+
+    def stats(self, by, **where):
+        """Per value of ``by``: rows plus every measure's mean and standard deviation."""
+        mask = self._rows(where)
+        groups, inverse = np.unique(self._keys[by][mask], return_inverse=True)
+        totals = np.zeros((len(groups), self.table.shape[1]))
+        np.add.at(totals, inverse, self.table[mask])
+        n = len(self.measures)
+        counts, sums, squares = totals[:, 1:1 + n], totals[:, 1 + n:1 + 2 * n], totals[:, 1 + 2 * n:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+            stds = np.sqrt(np.clip(squares / counts - means ** 2, 0, None))
+        columns = {'rows': totals[:, 0]}
+        columns.update({f'{m}_mean': means[:, i] for i, m in enumerate(self.measures)})
+        columns.update({f'{m}_std': stds[:, i] for i, m in enumerate(self.measures)})
+        return pd.DataFrame(columns, index=pd.Index(groups.tolist(), name=by))
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Isolation Forest anomaly scoring for the Patterns & Anomalies page
+
+Recomputes anomaly_results.csv (pca1/pca2, IsoForest_Score, Is_Anomaly) from
+the retail customer table and scores new customers without refitting.
+
+Trees are grown on a uniform sample of at most ``sample_size`` customers
+each and stored as flat arrays (split feature, threshold, children, and the
+path length credited at each leaf), so a batch is scored by walking every
+row down every tree at once, one depth level per step.
+
+``Is_Anomaly`` marks the ``contamination`` share of customers with the
+highest scores. The cutoff comes from a streaming quantile sketch of the
+scores: fitting seeds it from the sample, and ``updated(batch)`` folds in a
+new batch so its rows are flagged against the current distribution without
+rescoring earlier customers.
+
+    python anomaly.py                         # rewrite anomaly_results.csv
+    python anomaly.py --contamination 0.02 --output anomalies.csv
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+from clustering import CHUNK_ROWS, feature_matrix, feature_moments, iter_chunks, principal_axes
+from metrics import LogHistogram
+
+# Raw retail columns, so uploads need no derived fields
+FEATURES = ['Year_Birth', 'Income', 'Kidhome', 'Recency',
+            'MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts', 'MntGoldProds',
+            'NumWebPurchases', 'NumCatalogPurchases', 'NumStorePurchases', 'NumWebVisitsMonth']
+OUTPUT_COLUMNS = ['ID', 'pca1', 'pca2', 'IsoForest_Score', 'Is_Anomaly']
+
+N_TREES = 100
+SAMPLE_SIZE = 256
+CONTAMINATION = 0.05
+# Rows walked down the forest together (rows x trees node indexes per step)
+BLOCK_ROWS = 4096
+# Score sketch resolution; scores fall in (0, 1], so this is about 0.001 absolute
+SCORE_RELATIVE_ERROR = 0.001
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def average_path_length(n):
+    """Expected path length of an unsuccessful BST search among ``n`` points (c(n) in the paper)."""
+    n = np.asarray(n, dtype=float)
+    harmonic = np.log(np.maximum(n - 1, 1)) + EULER_GAMMA
+    return np.where(n > 2, 2 * harmonic - 2 * (n - 1) / np.maximum(n, 1), np.where(n == 2, 1.0, 0.0))
+
+
+# ============================================================================
+# FOREST
+# ============================================================================
+
+class IsolationForest:
+    """Every tree's nodes in shared flat arrays.
+
+    A right child is always stored right after its left child, so a step is
+    ``left[node] + (value >= threshold[node])``. Leaves point back at
+    themselves with an infinite threshold, so rows that reach one early stay
+    put for the remaining steps.
+    """
+
+    def __init__(self, feature, threshold, left, path, roots, sample_size):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.path = path  # leaf depth + c(leaf size); unused on internal nodes
+        self.roots = roots
+        self.sample_size = sample_size
+        self.max_depth = math.ceil(math.log2(max(sample_size, 2)))
+        self._normalizer = float(average_path_length(sample_size))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def path_lengths(self, values):
+        """Mean isolation depth of every row of ``values`` over all trees."""
+        out = np.empty(len(values))
+        for start in range(0, len(values), BLOCK_ROWS):
+            block = values[start:start + BLOCK_ROWS]
+            # Flat offsets into the block: row start + feature column
+            offsets = (np.arange(len(block), dtype=np.int32) * block.shape[1])[:, None]
+            flat = np.ascontiguousarray(block).ravel()
+            node = np.broadcast_to(self.roots, (len(block), self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                goes_right = flat[offsets + self.feature[node]] >= self.threshold[node]
+                node = self.left[node] + goes_right
+            out[start:start + len(block)] = self.path[node].mean(axis=1)
+        return out
+
+    def score(self, values):
+        """Anomaly score 2^(-E[h(x)] / c(sample_size)): near 1 isolates fast, about 0.5 or less is normal."""
+        return 2.0 ** (-self.path_lengths(values) / self._normalizer)
+
+
+def grow_forest(sample, n_trees=N_TREES, sample_size=SAMPLE_SIZE, rng=None):
+    rng = rng if rng is not None else np.random.default_rng(0)
+    sample_size = min(sample_size, len(sample))
+    max_depth = math.ceil(math.log2(max(sample_size, 2)))
+    feature, threshold, left, path, roots = [], [], [], [], []
+
+    def add_node():
+        feature.append(0)
+        threshold.append(np.inf)
+        left.append(len(left))
+        path.append(0.0)
+        return len(feature) - 1
+
+    for _ in range(n_trees):
+        rows = sample[rng.choice(len(sample), sample_size, replace=False)]
+        roots.append(add_node())
+        stack = [(roots[-1], rows, 0)]
+        while stack:
+            node, members, depth = stack.pop()
+            if depth < max_depth and len(members) > 1:
+                low, high = members.min(axis=0), members.max(axis=0)
+                splittable = np.flatnonzero(high > low)
+                if len(splittable):
+                    f = splittable[rng.integers(len(splittable))]
+                    cut = rng.uniform(low[f], high[f])
+                    goes_left = members[:, f] < cut
+                    feature[node], threshold[node] = f, cut
+                    left[node] = add_node()
+                    add_node()
+                    stack.append((left[node], members[goes_left], depth + 1))
+                    stack.append((left[node] + 1, members[~goes_left], depth + 1))
+                    continue
+            path[node] = depth + float(average_path_length(len(members)))
+
+    return IsolationForest(np.array(feature, dtype=np.int32), np.array(threshold), np.array(left, dtype=np.int32),
+                           np.array(path), np.array(roots, dtype=np.int32), sample_size)
+
+
+# ============================================================================
+# DETECTOR
+# ============================================================================
+
+class AnomalyDetector:
+
+    def __init__(self, forest, mean, std, components, sketch, contamination=CONTAMINATION):
+        self.forest = forest
+        self.mean = mean
+        self.std = std
+        self.components = components  # (2, n_features) principal axes for the pca1/pca2 scatter
+        self.sketch = sketch          # LogHistogram of scores over every customer seen
+        self.contamination = contamination
+
+    @property
+    def threshold(self):
+        """Score above which a customer is flagged."""
+        return self.sketch.quantile(1 - self.contamination)
+
+    def features(self, batch):
+        # Missing values (unparsed incomes) are imputed with the mean, and so are
+        # infinite ones, which would compare past a leaf's infinite threshold
+        values = feature_matrix(batch, FEATURES)
+        return np.where(np.isfinite(values), values, self.mean)
+
+    def score(self, batch):
+        """Anomaly scores in (0, 1] for a DataFrame with the FEATURES columns."""
+        return self.forest.score(self.features(batch))
+
+    def score_frame(self, batch):
+        """``score`` plus IsoForest_Score (threshold minus score, negative for anomalies) and Is_Anomaly."""
+        return self.score_values(self.features(batch))
+
+    def score_values(self, values):
+        """``score_frame`` for an already imputed feature matrix (``features``)."""
+        scores = self.forest.score(values)
+        decision = self.threshold - scores
+        return pd.DataFrame({'Anomaly_Score': scores, 'IsoForest_Score': decision,
+                             'Is_Anomaly': (decision < 0).astype(np.int8)})
+
+    def updated(self, batch):
+        """A detector whose threshold also reflects ``batch``; the trees are shared."""
+        sketch = self.sketch.copy()
+        sketch.observe_array(self.score(batch))
+        return AnomalyDetector(self.forest, self.mean, self.std, self.components, sketch, self.contamination)
+
+    def transform(self, frames, chunk_rows=CHUNK_ROWS):
+        """The anomaly_results schema for every customer (chunks are concatenated)."""
+        return pd.concat(list(self.iter_transform(frames, chunk_rows)), ignore_index=True)
+
+    def iter_transform(self, frames, chunk_rows=CHUNK_ROWS):
+        for chunk in iter_chunks(frames, chunk_rows):
+            values = self.features(chunk)
+            pca = ((values - self.mean) / self.std) @ self.components.T
+            scored = self.score_values(values)
+            yield pd.DataFrame({'ID': chunk['ID'].to_numpy(), 'pca1': pca[:, 0], 'pca2': pca[:, 1],
+                                'IsoForest_Score': scored['IsoForest_Score'].to_numpy(),
+                                'Is_Anomaly': scored['Is_Anomaly'].to_numpy()})
+
+
+def fit_detector(frames, n_trees=N_TREES, sample_size=SAMPLE_SIZE, contamination=CONTAMINATION,
+                 chunk_rows=CHUNK_ROWS, seed=0):
+    """Grow the forest and seed the threshold sketch in one pass over ``frames``."""
+    rng = np.random.default_rng(seed)
+    n, mean, std, correlation, sample = feature_moments(frames, chunk_rows, rng, features=FEATURES)
+    sample = np.where(np.isfinite(sample), sample, mean)
+    forest = grow_forest(sample, n_trees, sample_size, rng)
+    # The uniform sample stands in for all n customers until real batches arrive
+    sketch = LogHistogram(SCORE_RELATIVE_ERROR)
+    sketch.observe_array(forest.score(sample), weight=n / len(sample))
+    return AnomalyDetector(forest, mean, std, principal_axes(correlation), sketch, contamination)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute anomaly_results.csv with an Isolation Forest")
+    parser.add_argument('--input', default=None, help="customer CSV to stream (default: the dashboard's retail_data)")
+    parser.add_argument('--sep', default=',')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--trees', type=int, default=N_TREES)
+    parser.add_argument('--sample-size', type=int, default=SAMPLE_SIZE)
+    parser.add_argument('--contamination', type=float, default=CONTAMINATION)
+    parser.add_argument('--output', default='anomaly_results.csv')
+    args = parser.parse_args()
+
+    if args.input:
+        frames = lambda: pd.read_csv(args.input, sep=args.sep, usecols=['ID'] + FEATURES, chunksize=args.chunk_rows)
+    else:
+        from data_loader import DATASETS
+        frames = DATASETS['retail_data'][1](None)
+
+    detector = fit_detector(frames, args.trees, args.sample_size, args.contamination, args.chunk_rows)
+    rows = anomalies = 0
+    for i, out in enumerate(detector.iter_transform(frames, args.chunk_rows)):
+        out[OUTPUT_COLUMNS].to_csv(args.output, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(out)
+        anomalies += int(out['Is_Anomaly'].sum())
+    print(f"{rows:,} customers, {anomalies:,} anomalies (score > {detector.threshold:.4f}) -> {args.output}")
@@ -4,84 +4,323 @@ Marketing Analytics Dashboard - Premium Edition
 5-Page Interactive Dashboard with Modern UI Design
 """
 
+import gzip
+import io
+import itertools
+import json
+import os
+import threading
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, MATCH
 import dash_bootstrap_components as dbc
+from flask import request, jsonify, Response
+import numpy as np
 import pandas as pd
-from datetime import datetime
 # Data visualization libraries
-import plotly.express as px
 import plotly.graph_objects as go
 # Plotly for interactive visualizations
+from data_loader import (DataRegistry, register_datasets, SNAPSHOT_DIR, INGESTABLE, write_batch,
+                         preprocess_bank, preprocess_retail, combine, concat_chunks, source_income_fill,
+                         source_file_version)
+from aggregates import CohortCube, RunningMoments
+from figure_cache import FigureCache
+from figure_store import FigureStore
+from filter_index import BitmapIndex, RangeGridIndex
+from rule_store import RuleStore
+from downsampling import grid_sample, density_grid
+from clustering import FEATURES as CLUSTER_FEATURES, feature_matrix, fit_clusters, iter_chunks, segment_labels
+from anomaly import FEATURES as ANOMALY_FEATURES, fit_detector
+from neighbors import KDTree
+from metrics import Metrics
+from profiling import ADMIN_COOKIE, CallbackProfiler
+from background import background_manager, heavy_callback
 
 # ============================================================================
-# DATA LOADING
+# DATA LOADING + PREPROCESSING
 # ============================================================================
 
-bank_data = pd.read_csv('bank-direct-marketing-campaigns.csv')
-retail_data = pd.read_csv('marketing_campaign.csv', sep=';')
-classification_results = pd.read_csv('classification_results_all.csv')
-regression_results = pd.read_csv('regression_results_all.csv')
-clustering_results = pd.read_csv('clustering_results.csv')
-association_rules = pd.read_csv('association_rules.csv')
-anomaly_results = pd.read_csv('anomaly_results.csv')
+# Each dataset is loaded on first use (or by the background prefetch below)
+# from a binary snapshot keyed by its source CSVs (see data_loader.py), so
+# the server boots and answers health checks before any data is parsed
+data = DataRegistry()
+register_datasets(data)
+
+# DASHBOARD_CLUSTERS=compute segments retail_data in-process with clustering.py
+# (mini-batch K-Means, refit whenever retail_data changes) instead of reading
+# the clustering_results.csv export
+CLUSTER_SOURCE = os.environ.get('DASHBOARD_CLUSTERS', 'csv')
+CLUSTER_K = int(os.environ.get('DASHBOARD_CLUSTER_K', '4'))
+last_cluster_model = [None]
+
+def build_cluster_model():
+    # Warm-start from the previous fit so cluster numbers survive refits
+    previous = last_cluster_model[0]
+    init = previous.centers if previous is not None and previous.k == CLUSTER_K else None
+    model = fit_clusters(data.get('retail_data'), k=CLUSTER_K, init=init)
+    last_cluster_model[0] = model
+    return model
+
+if CLUSTER_SOURCE == 'compute':
+    data.register('cluster_model', build_cluster_model)
+    data.register('clustering_results', lambda: data.get('cluster_model').transform(data.get('retail_data')))
+
+# Running per-cluster sums/counts, so ingested rows update cluster_stats in O(batch)
+data.register('cluster_moments', lambda: RunningMoments.from_frame(
+    data.get('clustering_results'), ['Income', 'MntWines', 'MntMeatProducts', 'Recency', 'Kidhome', 'ID'],
+    group_column='cluster'))
+
+def build_cluster_centers():
+    # The fitted centers when clusters are computed; the CSV clusters' member means otherwise
+    if CLUSTER_SOURCE == 'compute':
+        return data.get('cluster_model').centers
+    return data.get('cluster_moments').means()[CLUSTER_FEATURES]
+
+def build_cluster_stats():
+    centers = data.get('cluster_centers')
+    sizes = data.get('cluster_moments').counts['ID'].reindex(centers.index, fill_value=0)
+    cluster_stats = pd.DataFrame({
+        'Cluster': centers.index.to_numpy(), 'Avg_Income': centers['Income'].to_numpy(),
+        'Avg_Wines': centers['MntWines'].to_numpy(), 'Avg_Meat': centers['MntMeatProducts'].to_numpy(),
+        'Avg_Recency': centers['Recency'].to_numpy(), 'Avg_Kids': centers['Kidhome'].to_numpy(),
+        'Size': sizes.to_numpy().astype(int),
+    })
+    cluster_stats['Total_Spending'] = cluster_stats['Avg_Wines'] + cluster_stats['Avg_Meat']
+    return cluster_stats
+
+# Segment names follow from the centers (see clustering.segment_labels); for
+# the shipped CSV that is 0 Low-Income Family, 1 High-Spending Elite,
+# 2 Middle-Class Stable and 3 Premium VIP
+def build_cluster_labels():
+    cluster_labels = {c: f'Cluster {c}' for c in data.get('clustering_results')['cluster'].unique()}
+    cluster_labels.update(segment_labels(data.get('cluster_centers')))
+    return cluster_labels
+
+data.register('cluster_centers', build_cluster_centers)
+data.register('cluster_stats', build_cluster_stats)
+data.register('cluster_labels', build_cluster_labels)
+
+# Cohort cube behind the Overview KPIs and the Live Prediction population
+# comparisons: every bank and retail customer, with retail customers placed
+# in their clustering_results cluster (-1 when not clustered)
+COHORT_DIMENSIONS = {'Age_Group': 'Unknown', 'Income_Level': 'Unknown', 'cluster': -1, 'Campaign_Type': 'Unknown'}
+COHORT_MEASURES = ['Income', 'Total_Spending', 'Recency', 'Response']
+
+def build_cluster_membership(membership=None, clusters=None):
+    # Cluster by customer ID; a later row for the same ID wins
+    clusters = data.get('clustering_results') if clusters is None else clusters
+    rows = pd.Series(clusters['cluster'].to_numpy(), index=clusters['ID'].to_numpy())
+    if membership is not None:
+        rows = pd.concat([membership, rows])
+    return rows[~rows.index.duplicated(keep='last')]
+
+def with_clusters(retail_rows):
+    membership = data.get('cluster_membership')
+    clusters = membership.reindex(retail_rows['ID'].to_numpy()).fillna(-1).to_numpy().astype(int)
+    return retail_rows.assign(cluster=clusters)
+
+def build_cohort_cube():
+    cube = CohortCube.from_frame(data.get('bank_data'), COHORT_DIMENSIONS, COHORT_MEASURES)
+    return cube.updated(with_clusters(data.get('retail_data')))
+
+data.register('cluster_membership', lambda: build_cluster_membership())
+data.register('cohort_cube', build_cohort_cube)
+# Income fill value for ingested retail rows; it only changes with the source CSV
+data.register('retail_income_fill', source_income_fill, version=lambda: source_file_version('retail_data'))
+
+# Categorical bitmaps over the Overview filter columns
+data.register('overview_index', lambda: BitmapIndex(
+    data.get('combined_data'), ['Age_Group', 'Education', 'Marital_Status'],
+    group_column='Campaign_Type', value_columns=['Age', 'Response'], histogram_bins={'Age': 20}))
+
+# Parsed itemsets with per-item posting lists for the Pattern Mining page
+data.register('rule_store', lambda: RuleStore(data.get('association_rules')))
+
+# Segment + slider-step grid over the Segments page filters
+CLUSTER_RANGE_STEPS = {'Income': 10000, 'Recency': 10}
+data.register('cluster_range_index', lambda: RangeGridIndex(
+    data.get('clustering_results'), 'cluster', CLUSTER_RANGE_STEPS))
 
 # ============================================================================
-# DATA PREPROCESSING
+# PREDICTION MODEL
 # ============================================================================
 
-bank_data['Response'] = (bank_data['y'] == 'yes').astype(int)
-bank_data['Campaign_Type'] = 'Bank'
-
-retail_data['Income'] = pd.to_numeric(retail_data['Income'], errors='coerce')
-retail_data['Income'] = retail_data['Income'].fillna(retail_data['Income'].median())
-retail_data['Age'] = datetime.now().year - retail_data['Year_Birth']
-retail_data['Total_Spending'] = (retail_data['MntWines'] + retail_data['MntFruits'] + 
-                                  retail_data['MntMeatProducts'] + retail_data['MntFishProducts'] + 
-                                  retail_data['MntSweetProducts'] + retail_data['MntGoldProds'])
-retail_data['Total_Accepted'] = (retail_data['AcceptedCmp1'] + retail_data['AcceptedCmp2'] + 
-                                  retail_data['AcceptedCmp3'] + retail_data['AcceptedCmp4'] + 
-                                  retail_data['AcceptedCmp5'] + retail_data['Response'])
-retail_data['Campaign_Type'] = 'Retail'
-
-def create_age_group(age):
-    if age < 30: return '18-29'
-    elif age < 40: return '30-39'
-    elif age < 50: return '40-49'
-    elif age < 60: return '50-59'
-    else: return '60+'
-
-bank_data['Age_Group'] = bank_data['age'].apply(create_age_group)
-retail_data['Age_Group'] = retail_data['Age'].apply(create_age_group)
-retail_data['Income_Level'] = pd.cut(retail_data['Income'], 
-                                      bins=[0, 30000, 60000, 100000, float('inf')],
-                                      labels=['Low', 'Medium', 'High', 'Very High'])
-
-bank_subset = bank_data[['age', 'education', 'marital', 'Response', 'Campaign_Type', 'Age_Group']].copy()
-bank_subset.columns = ['Age', 'Education', 'Marital_Status', 'Response', 'Campaign_Type', 'Age_Group']
-retail_subset = retail_data[['Age', 'Education', 'Marital_Status', 'Response', 'Campaign_Type', 'Age_Group']].copy()
-combined_data = pd.concat([bank_subset, retail_subset], ignore_index=True)
-
-association_rules['antecedents'] = association_rules['antecedents'].str.replace(r"frozenset\(\{|\}\)", '', regex=True).str.replace("'", "")
-association_rules['consequents'] = association_rules['consequents'].str.replace(r"frozenset\(\{|\}\)", '', regex=True).str.replace("'", "")
-
-cluster_stats = clustering_results.groupby('cluster').agg({
-    'Income': 'mean', 'MntWines': 'mean', 'MntMeatProducts': 'mean',
-    'Recency': 'mean', 'Kidhome': 'mean', 'ID': 'count'
-}).reset_index()
-cluster_stats.columns = ['Cluster', 'Avg_Income', 'Avg_Wines', 'Avg_Meat', 'Avg_Recency', 'Avg_Kids', 'Size']
-cluster_stats['Total_Spending'] = cluster_stats['Avg_Wines'] + cluster_stats['Avg_Meat']
-
-# Cluster labels derived from CSV data analysis:
-# Cluster 0: Avg Income $35,180, has kids (1.0) → Low-Income Family
-# Cluster 1: Avg Income $72,723, high spending, no kids → High-Spending Elite  
-# Cluster 2: Avg Income $57,106, medium spending → Middle-Class Stable
-# Cluster 3: Avg Income $81,183, highest spending → Premium VIP
-cluster_labels = {c: f'Cluster {c}' for c in clustering_results['cluster'].unique()}
-cluster_labels.update({
-    0: 'Low-Income Family', 1: 'High-Spending Elite',
-    2: 'Middle-Class Stable', 3: 'Premium VIP'
-})
+class PredictionModel:
+    """Nearest-center segment model used by the Live Prediction page.
+
+    Everything that does not depend on the submitted customer (cluster centers,
+    distance normalizers, per-cluster response rates and population means) is
+    computed once here, so a prediction is an O(k) lookup over the centers.
+    """
+
+    def __init__(self, centers, clustering_results, cohort_cube, labels=None):
+        self.labels = labels or {}
+        self.clusters = centers.index.to_numpy().astype(int)
+        self.center_income = centers['Income'].to_numpy(dtype=float)
+        self.center_recency = centers['Recency'].to_numpy(dtype=float)
+        center_spending = (centers['MntWines'] + centers['MntMeatProducts']).to_numpy(dtype=float)
+        self.centers = np.column_stack([self.center_income, center_spending, self.center_recency])
+
+        # Normalizers for the Euclidean distance (prevent division by zero)
+        income_max = clustering_results['Income'].max() or 1
+        spending_max = (clustering_results['MntWines'] + clustering_results['MntMeatProducts']).max() or 1
+        recency_max = clustering_results['Recency'].max() or 1
+        self.scale = np.array([income_max, spending_max, recency_max], dtype=float)
+
+        # Population averages of retail customers (marketing_campaign.csv), rolled up from the cohort cube
+        self.population_size = cohort_cube.size(Campaign_Type='Retail')
+        self.population_response = cohort_cube.mean('Response', Campaign_Type='Retail')
+        self.population_income = cohort_cube.mean('Income', Campaign_Type='Retail')
+        self.population_spending = cohort_cube.mean('Total_Spending', Campaign_Type='Retail')
+        self.population_recency = cohort_cube.mean('Recency', Campaign_Type='Retail')
+
+        # Response rate per cluster, falling back to the population rate for
+        # clusters without matching retail customers
+        rates = cohort_cube.stats('cluster', Campaign_Type='Retail')['Response_mean'].reindex(self.clusters)
+        self.response_rates = rates.fillna(self.population_response).to_numpy(dtype=float)
+
+    def nearest(self, income, spending, recency):
+        """Return center indices (into ``self.clusters``) for arrays of customers."""
+        points = np.column_stack([income, spending, recency]).astype(float)
+        # (n, 1, 3) - (k, 3) -> (n, k) squared normalized distances
+        dist = (((points[:, None, :] - self.centers) / self.scale) ** 2).sum(axis=2)
+        return dist.argmin(axis=1)
+
+    def probabilities(self, idx, income, recency):
+        """Cluster response rate adjusted by income/recency relative to the cluster average."""
+        cluster_avg_income = self.center_income[idx]
+        cluster_avg_recency = self.center_recency[idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            income_factor = np.where(cluster_avg_income > 0,
+                                     1.0 + 0.2 * ((income - cluster_avg_income) / cluster_avg_income), 1.0)
+            recency_factor = np.where(cluster_avg_recency > 0,
+                                      1.0 + 0.1 * ((cluster_avg_recency - recency) / cluster_avg_recency), 1.0)
+        probability = self.response_rates[idx] * income_factor * recency_factor
+        return np.clip(probability, 0.05, 0.95)  # Clamp between 5% and 95%
+
+    def strategies(self, probability, income):
+        """Rule-based strategy on probability + income."""
+        return np.select(
+            [(probability >= 0.5) & (income >= self.population_income), probability >= 0.3],
+            ['High Value', 'Medium Priority'], default='Low Investment')
+
+    def predict(self, income, spending, recency):
+        """Return ``(cluster, probability)`` for a single customer."""
+        idx = self.nearest([income], [spending], [recency])
+        probability = self.probabilities(idx, income, recency)
+        return int(self.clusters[idx[0]]), float(probability[0])
+
+    def score_batch(self, age, income, spending, recency):
+        """Score many customers at once.
+
+        Takes array-likes of equal length and returns a DataFrame with the
+        inputs plus ``cluster``, ``segment``, ``probability`` and ``strategy``.
+        """
+        income = np.asarray(income, dtype=float)
+        spending = np.asarray(spending, dtype=float)
+        recency = np.asarray(recency, dtype=float)
+
+        idx = self.nearest(income, spending, recency)
+        clusters = self.clusters[idx]
+        probability = self.probabilities(idx, income, recency)
+        segment_names = np.array([self.labels.get(c, f'Cluster {c}') for c in self.clusters], dtype=object)
+
+        return pd.DataFrame({
+            'age': np.asarray(age), 'income': income, 'spending': spending, 'recency': recency,
+            'cluster': clusters,
+            'segment': segment_names[idx],
+            'probability': probability,
+            'strategy': self.strategies(probability, income),
+        })
+
+    def score_frame(self, df):
+        """``score_batch`` over a DataFrame with age/income/spending/recency columns."""
+        return self.score_batch(df['age'], df['income'], df['spending'], df['recency'])
+
+
+data.register('prediction_model', lambda: PredictionModel(
+    data.get('cluster_centers'), data.get('clustering_results'), data.get('cohort_cube'),
+    labels=data.get('cluster_labels')))
+
+SIMILAR_CUSTOMERS = 10
+
+class SimilarCustomers:
+    """KD-tree over retail customers in the prediction model's normalized income/spending/recency space."""
+
+    def __init__(self, retail_data, scale):
+        self.customers = pd.DataFrame({
+            'ID': retail_data['ID'].to_numpy(), 'Income': retail_data['Income'].to_numpy(dtype=float),
+            'Spending': (retail_data['MntWines'] + retail_data['MntMeatProducts']).to_numpy(dtype=float),
+            'Recency': retail_data['Recency'].to_numpy(dtype=float), 'Response': retail_data['Response'].to_numpy(),
+        })
+        self.scale = scale
+        self.tree = KDTree(self.customers[['Income', 'Spending', 'Recency']].to_numpy() / scale)
+
+    def query(self, income, spending, recency, k=SIMILAR_CUSTOMERS):
+        """The ``k`` nearest customers, nearest first, with their normalized ``Distance``."""
+        rows, distances = self.tree.query(np.array([income, spending, recency], dtype=float) / self.scale, k)
+        return self.customers.iloc[rows].assign(Distance=distances)
+
+data.register('similar_customers', lambda: SimilarCustomers(
+    data.get('retail_data'), data.get('prediction_model').scale))
+
+# Isolation Forest over retail_data, fitted on first use; it scores uploads
+# (/api/anomaly-score) and, with DASHBOARD_ANOMALIES=compute, replaces the
+# anomaly_results.csv export for page 4. Ingested retail rows are scored and
+# flagged against the updated threshold without refitting.
+ANOMALY_SOURCE = os.environ.get('DASHBOARD_ANOMALIES', 'csv')
+data.register('anomaly_model', lambda: fit_detector(data.get('retail_data')))
+if ANOMALY_SOURCE == 'compute':
+    data.register('anomaly_results', lambda: data.get('anomaly_model').transform(data.get('retail_data')))
+
+# Datasets each page needs before it can render; pages never wait on data
+# they do not use (e.g. page 2 only needs the model results CSVs)
+PAGE_DATASETS = {
+    "/": ['cohort_cube', 'combined_data', 'overview_index'],
+    "/page-2": ['classification_results', 'regression_results'],
+    "/page-3": ['clustering_results', 'cluster_stats', 'cluster_labels', 'cluster_range_index'],
+    "/page-4": ['rule_store', 'anomaly_results'],
+    "/page-5": ['prediction_model', 'cluster_stats', 'similar_customers'],
+}
+
+if os.environ.get('DASHBOARD_PREFETCH', '1') != '0':
+    data.prefetch()
+
+# Bump when build_page1_figures changes so shared cached figures are rebuilt
+PAGE1_FIGURES_VERSION = 3
+
+# Overview figures keyed by (data version, filter tuple); the directory is
+# shared by all gunicorn workers. DASHBOARD_FIGURE_CACHE_DIR='' keeps it in-process.
+page1_figure_cache = FigureCache(
+    maxsize=int(os.environ.get('DASHBOARD_FIGURE_CACHE_SIZE', '2048')),
+    ttl=float(os.environ['DASHBOARD_FIGURE_CACHE_TTL']) if os.environ.get('DASHBOARD_FIGURE_CACHE_TTL') else None,
+    directory=os.environ.get('DASHBOARD_FIGURE_CACHE_DIR', os.path.join(SNAPSHOT_DIR, 'figures')) or None)
+
+# Pre-encoded, gzipped JSON of the static page figures, served by /_figure/<digest>
+figure_store = FigureStore(
+    directory=os.environ.get('DASHBOARD_FIGURE_STORE_DIR', os.path.join(SNAPSHOT_DIR, 'figure_store')) or None)
+
+# Gzip Dash's JSON responses (callback outputs, layout, dependencies) above this size
+COMPRESS_MIN_BYTES = int(os.environ.get('DASHBOARD_COMPRESS_MIN_BYTES', '1024'))
+
+# Per-callback wall/CPU time, rows and response bytes, served on /metrics (see metrics.py)
+metrics = Metrics(enabled=os.environ.get('DASHBOARD_METRICS', '0') == '1')
+
+# Opt-in captures of slow (or a sampled fraction of) callbacks with their inputs,
+# listed slowest first on /admin/profiles?token=$DASHBOARD_ADMIN_TOKEN (see profiling.py)
+profiler = CallbackProfiler(
+    os.environ.get('DASHBOARD_PROFILE_DIR', os.path.join(SNAPSHOT_DIR, 'profiles')),
+    enabled=os.environ.get('DASHBOARD_PROFILE', '0') == '1',
+    threshold=float(os.environ.get('DASHBOARD_PROFILE_THRESHOLD', '1.0')),
+    sample_rate=float(os.environ.get('DASHBOARD_PROFILE_SAMPLE_RATE', '0')),
+    max_captures=int(os.environ.get('DASHBOARD_PROFILE_MAX_CAPTURES', '200')),
+    admin_token=os.environ.get('DASHBOARD_ADMIN_TOKEN'))
+
+# DASHBOARD_BACKGROUND=1 runs the long-running callbacks (segmentation
+# re-runs) as background jobs in a local diskcache queue;
+# None (run in the request) when off or when its dependencies are missing
+callback_manager = background_manager(
+    os.environ.get('DASHBOARD_BACKGROUND_DIR', os.path.join(SNAPSHOT_DIR, 'jobs')),
+    enabled=os.environ.get('DASHBOARD_BACKGROUND', '0') == '1')
 
 # ============================================================================
 # APP INITIALIZATION WITH CUSTOM CSS
@@ -442,6 +681,8 @@ app.index_string = '''
 
 app.layout = html.Div([
     dcc.Location(id="url"),
+    # Re-renders the current page while its datasets are still loading
+    dcc.Interval(id="data-poll", interval=1000, disabled=True),
     sidebar,
     content
 ], className="main-container")
@@ -470,15 +711,132 @@ def create_glass_card(title, children, icon="fa-chart-bar"):
         html.Div(children, className="glass-card-body")
     ], className="glass-card")
 
+def stored_graph(name, fig, **graph_kwargs):
+    # The figure is fetched from the figure store by a clientside callback
+    # instead of being re-serialized into every page response
+    digest = figure_store.put(fig)
+    return html.Div([
+        dcc.Store(id={'type': 'figure-src', 'index': name}, data=app.get_relative_path(f'/_figure/{digest}')),
+        dcc.Graph(id={'type': 'stored-figure', 'index': name}, **graph_kwargs)
+    ])
+
+# Scatter rendering: SVG markers up to SCATTER_WEBGL_THRESHOLD points, WebGL
+# (Scattergl) above it. Past SCATTER_MAX_POINTS the points are also reduced on
+# the server: 'sample' keeps a density-preserving subset, 'density' draws a
+# 2D-binned heatmap, 'none' sends every point.
+SCATTER_WEBGL_THRESHOLD = int(os.environ.get('DASHBOARD_SCATTER_WEBGL_THRESHOLD', '5000'))
+SCATTER_REDUCTION = os.environ.get('DASHBOARD_SCATTER_REDUCTION', 'sample')
+SCATTER_MAX_POINTS = int(os.environ.get('DASHBOARD_SCATTER_MAX_POINTS', '20000'))
+CLUSTER_COLORS = ['#6366f1', '#ec4899', '#10b981', '#f59e0b']
+
+def scatter_trace(n_points, outline_width=1):
+    # Scatter class and marker outline for the number of points being drawn
+    # (outlines are dropped under WebGL, where they cost more than they show)
+    if n_points > SCATTER_WEBGL_THRESHOLD:
+        return go.Scattergl, dict(width=0)
+    return go.Scatter, dict(width=outline_width, color='white')
+
+def reduce_points(df, max_points=None):
+    """Density-preserving subset of a frame with pca1/pca2 columns."""
+    max_points = max_points or SCATTER_MAX_POINTS
+    if SCATTER_REDUCTION != 'sample' or len(df) <= max_points:
+        return df
+    return df.iloc[grid_sample(df['pca1'].to_numpy(), df['pca2'].to_numpy(), max_points)]
+
+def density_heatmap(df, colorscale):
+    x, y, z = density_grid(df['pca1'].to_numpy(), df['pca2'].to_numpy())
+    return go.Heatmap(x=x, y=y, z=z, colorscale=colorscale, showscale=False, name='Density',
+                      hovertemplate='PC1=%{x:.2f}<br>PC2=%{y:.2f}<br>Customers=%{z}<extra></extra>')
+
+def sample_note(fig, shown, total):
+    if shown < total:
+        fig.add_annotation(text=f"Showing {shown:,} of {total:,} customers", x=1, y=1.02, xref='paper', yref='paper',
+                           xanchor='right', yanchor='bottom', showarrow=False, font=dict(size=11, color='#94a3b8'))
+
+def build_cluster_scatter(points, clusters, height):
+    """PCA scatter colored by segment; ``clusters`` fixes the color assignment."""
+    cluster_color_map = {c: CLUSTER_COLORS[i % len(CLUSTER_COLORS)] for i, c in enumerate(clusters)}
+    total = len(points)
+    fig = go.Figure()
+    
+    if SCATTER_REDUCTION == 'density' and total > SCATTER_MAX_POINTS:
+        fig.add_trace(density_heatmap(points, [[0, '#e0e7ff'], [1, '#4338ca']]))
+        centroids = points.groupby('cluster')[['pca1', 'pca2']].mean()
+        for c, center in centroids.iterrows():
+            fig.add_trace(go.Scatter(x=[center['pca1']], y=[center['pca2']], mode='markers', name=str(c),
+                marker=dict(size=16, color=cluster_color_map.get(c, '#64748b'), symbol='diamond', line=dict(width=2, color='white'))))
+    else:
+        points = reduce_points(points)
+        sample_note(fig, len(points), total)
+        trace, outline = scatter_trace(len(points))
+        for c in clusters:
+            subset = points[points['cluster'] == c]
+            if len(subset) == 0:
+                continue
+            fig.add_trace(trace(
+                x=subset['pca1'], y=subset['pca2'], mode='markers', name=str(c),
+                customdata=subset[['Income', 'MntWines', 'Recency']].to_numpy(),
+                hovertemplate=f'Segment={c}<br>PC1=%{{x}}<br>PC2=%{{y}}<br>Income=%{{customdata[0]}}'
+                              '<br>MntWines=%{customdata[1]}<br>Recency=%{customdata[2]}<extra></extra>',
+                marker=dict(size=10, opacity=0.8, color=cluster_color_map[c], line=outline)))
+    
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=height,
+        font=dict(color='#334155'), margin=dict(l=50, r=30, t=30, b=50), legend=dict(title_text='Segment'),
+        xaxis=dict(title='PC1', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
+        yaxis=dict(title='PC2', gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
+    )
+    return fig
+
+def build_anomaly_scatter(anomaly_results):
+    """Normal customers (reduced when large) with every anomaly always drawn on top."""
+    is_anomaly = anomaly_results['Is_Anomaly'].to_numpy() == 1
+    normal = anomaly_results[~is_anomaly]
+    anomalies = anomaly_results[is_anomaly]
+    fig_anomaly = go.Figure()
+    
+    if SCATTER_REDUCTION == 'density' and len(normal) > SCATTER_MAX_POINTS:
+        fig_anomaly.add_trace(density_heatmap(normal, [[0, '#e0e7ff'], [1, '#6366f1']]))
+    else:
+        shown = reduce_points(normal)
+        sample_note(fig_anomaly, len(shown), len(normal))
+        trace, outline = scatter_trace(len(shown))
+        fig_anomaly.add_trace(trace(x=shown['pca1'], y=shown['pca2'], mode='markers', name='Normal',
+            marker=dict(size=8, color='#6366f1', opacity=0.7, line=outline)))
+    trace, outline = scatter_trace(len(anomalies), outline_width=2)
+    fig_anomaly.add_trace(trace(x=anomalies['pca1'], y=anomalies['pca2'], mode='markers', name='Anomaly',
+        marker=dict(size=12, color='#ef4444', opacity=0.9, symbol='x', line=outline)))
+    
+    fig_anomaly.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=320,
+        font=dict(color='#334155'), margin=dict(l=50, r=30, t=20, b=50),
+        xaxis=dict(title='PC1', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
+        yaxis=dict(title='PC2', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
+        legend=dict(font=dict(color='#334155'), bgcolor='rgba(0,0,0,0)')
+    )
+    return fig_anomaly
+
 # ============================================================================
 # PAGE 1: OVERVIEW
 # ============================================================================
 
+def page1_filter_options(combined_data):
+    # Dropdown values for the Overview filters (also enumerated by the figure cache warm-up)
+    return {
+        'age': list(combined_data['Age_Group'].unique()),
+        'education': list(combined_data['Education'].dropna().unique()[:10]),
+        'campaign': ['Bank', 'Retail'],
+        'marital': list(combined_data['Marital_Status'].dropna().unique()[:6]),
+    }
+
 def page_1_layout():
-    total_customers = len(bank_data) + len(retail_data)
-    avg_income = retail_data['Income'].mean()
-    response_rate = (bank_data['Response'].sum() + retail_data['Response'].sum()) / total_customers * 100
-    avg_spending = retail_data['Total_Spending'].mean()
+    cohort_cube = data.get('cohort_cube')
+    combined_data = data.get('combined_data')
+    total_customers = cohort_cube.size()
+    avg_income = cohort_cube.mean('Income')
+    response_rate = cohort_cube.mean('Response') * 100
+    avg_spending = cohort_cube.mean('Total_Spending')
+    filter_options = page1_filter_options(combined_data)
     
     return html.Div([
         # Page Header
@@ -504,7 +862,7 @@ def page_1_layout():
                         html.Label("Age Group", className="filter-label"),
                         dcc.Dropdown(
                             id='age-filter',
-                            options=[{'label': ag, 'value': ag} for ag in ['All'] + list(combined_data['Age_Group'].unique())],
+                            options=[{'label': ag, 'value': ag} for ag in ['All'] + filter_options['age']],
                             value='All',
                             style={'marginBottom': '20px'},
                             className="dash-dropdown"
@@ -513,7 +871,7 @@ def page_1_layout():
                         dcc.Dropdown(
                             id='education-filter',
                             options=[{'label': 'All', 'value': 'All'}] + 
-                                    [{'label': e, 'value': e} for e in combined_data['Education'].dropna().unique()[:10]],
+                                    [{'label': e, 'value': e} for e in filter_options['education']],
                             value='All',
                             style={'marginBottom': '20px'}
                         ),
@@ -527,7 +885,7 @@ def page_1_layout():
                         html.Label("Marital Status", className="filter-label"),
                         dcc.Dropdown(
                             id='marital-filter',
-                            options=[{'label': 'All', 'value': 'All'}] + [{'label': m, 'value': m} for m in combined_data['Marital_Status'].dropna().unique()[:6]],
+                            options=[{'label': 'All', 'value': 'All'}] + [{'label': m, 'value': m} for m in filter_options['marital']],
                             value='All'
                         ),
                     ])
@@ -557,6 +915,8 @@ def page_1_layout():
 # ============================================================================
 
 def page_2_layout():
+    classification_results = data.get('classification_results')
+    regression_results = data.get('regression_results')
     # Load KPIs directly from CSV data - no hardcoding
     best_class_acc = classification_results['Accuracy'].max()
     best_class_model = classification_results.loc[classification_results['Accuracy'].idxmax(), 'Model']
@@ -617,12 +977,12 @@ def page_2_layout():
         dbc.Row([
             dbc.Col([
                 create_glass_card("Classification Model Accuracy", [
-                    dcc.Graph(figure=fig_class, config={'displayModeBar': False})
+                    stored_graph('classification', fig_class, config={'displayModeBar': False})
                 ], icon="fa-bullseye")
             ], lg=6, className="mb-4"),
             dbc.Col([
                 create_glass_card("Regression Model RMSE", [
-                    dcc.Graph(figure=fig_reg, config={'displayModeBar': False})
+                    stored_graph('regression', fig_reg, config={'displayModeBar': False})
                 ], icon="fa-chart-area")
             ], lg=6, className="mb-4"),
         ]),
@@ -652,27 +1012,11 @@ def page_2_layout():
 # ============================================================================
 
 def page_3_layout():
-    colors_cluster = ['#6366f1', '#ec4899', '#10b981', '#f59e0b']
-    
-    # Convert cluster to string for discrete coloring
-    cluster_plot_data = clustering_results.copy()
-    cluster_plot_data['cluster_str'] = cluster_plot_data['cluster'].astype(str)
+    cluster_stats = data.get('cluster_stats')
+    cluster_labels = data.get('cluster_labels')
+    colors_cluster = CLUSTER_COLORS
     
-    # Dynamic color mapping based on actual clusters in CSV
-    unique_clusters = sorted(clustering_results['cluster'].unique())
-    cluster_color_map = {str(c): colors_cluster[i % len(colors_cluster)] for i, c in enumerate(unique_clusters)}
-    
-    fig_pca = px.scatter(cluster_plot_data, x='pca1', y='pca2', color='cluster_str',
-                         labels={'pca1': 'PC1', 'pca2': 'PC2', 'cluster_str': 'Segment'},
-                         color_discrete_map=cluster_color_map,
-                         hover_data=['Income', 'MntWines', 'Recency'])
-    fig_pca.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=380,
-        font=dict(color='#334155'), margin=dict(l=50, r=30, t=30, b=50),
-        xaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
-        yaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
-    )
-    fig_pca.update_traces(marker=dict(size=10, opacity=0.8, line=dict(width=1, color='white')))
+    # The PCA scatter itself is drawn by update_cluster_chart, which fires on page load
     
     categories = ['Income', 'Wine', 'Meat', 'Recency', 'Kids']
     fig_radar = go.Figure()
@@ -730,12 +1074,12 @@ def page_3_layout():
                         ], lg=4, md=12, className="mb-3"),
                         dbc.Col([
                             html.Label("Income Range ($)", className="filter-label"),
-                            dcc.RangeSlider(id='income-range', min=0, max=150000, step=10000, value=[0, 150000],
+                            dcc.RangeSlider(id='income-range', min=0, max=150000, step=CLUSTER_RANGE_STEPS['Income'], value=[0, 150000],
                                 marks={0: {'label': '0', 'style': {'color': '#64748b'}}, 75000: {'label': '75K', 'style': {'color': '#64748b'}}, 150000: {'label': '150K', 'style': {'color': '#64748b'}}})
                         ], lg=4, md=12, className="mb-3"),
                         dbc.Col([
                             html.Label("Recency (Days)", className="filter-label"),
-                            dcc.RangeSlider(id='recency-range', min=0, max=100, step=10, value=[0, 100],
+                            dcc.RangeSlider(id='recency-range', min=0, max=100, step=CLUSTER_RANGE_STEPS['Recency'], value=[0, 100],
                                 marks={0: {'label': '0', 'style': {'color': '#64748b'}}, 50: {'label': '50', 'style': {'color': '#64748b'}}, 100: {'label': '100', 'style': {'color': '#64748b'}}})
                         ], lg=4, md=12, className="mb-3"),
                     ])
@@ -746,12 +1090,12 @@ def page_3_layout():
         dbc.Row([
             dbc.Col([
                 create_glass_card("PCA Cluster Visualization", [
-                    dcc.Graph(id='pca-cluster-chart', figure=fig_pca, config={'displayModeBar': False})
+                    dcc.Graph(id='pca-cluster-chart', config={'displayModeBar': False})
                 ], icon="fa-project-diagram")
             ], lg=6, className="mb-4"),
             dbc.Col([
                 create_glass_card("Segment Profile Radar", [
-                    dcc.Graph(figure=fig_radar, config={'displayModeBar': False})
+                    stored_graph('radar', fig_radar, config={'displayModeBar': False})
                 ], icon="fa-chart-radar")
             ], lg=6, className="mb-4"),
         ]),
@@ -761,6 +1105,33 @@ def page_3_layout():
                 create_glass_card("Segment Summary", [
                     dbc.Table.from_dataframe(cluster_summary, striped=False, bordered=False, hover=True, className="premium-table")
                 ], icon="fa-list-alt")
+            ], width=12, className="mb-4")
+        ]),
+        
+        dbc.Row([
+            dbc.Col([
+                create_glass_card("Re-run Segmentation", [
+                    dbc.Row([
+                        dbc.Col([
+                            html.Label("Segments (k)", className="filter-label"),
+                            dcc.Dropdown(id='rerun-k', options=[{'label': str(k), 'value': k} for k in range(2, 9)],
+                                         value=CLUSTER_K, clearable=False)
+                        ], lg=3, md=12, className="mb-3"),
+                        dbc.Col([
+                            html.Button([html.I(className="fas fa-play", style={"marginRight": "10px"}), "Run"],
+                                        id='rerun-btn', n_clicks=0, className="btn-premium", style={"cursor": "pointer", "marginRight": "10px"}),
+                            html.Button("Cancel", id='rerun-cancel', n_clicks=0, className="btn-premium", disabled=True,
+                                        style={"cursor": "pointer", "background": "#94a3b8"}),
+                        ], lg=3, md=12, className="mb-3", style={"paddingTop": "24px"}),
+                        dbc.Col([
+                            html.Label("Progress", className="filter-label"),
+                            dbc.Progress(id='rerun-progress', value=0, max=100, style={"height": "20px"}),
+                        ], lg=6, md=12, className="mb-3"),
+                    ]),
+                    html.Div(id='rerun-result', children=html.P(
+                        "Fit mini-batch K-Means on the current customers and preview the segments",
+                        style={"color": "#94a3b8", "margin": 0}))
+                ], icon="fa-sync-alt")
             ], width=12)
         ])
     ])
@@ -770,10 +1141,12 @@ def page_3_layout():
 # ============================================================================
 
 def page_4_layout():
-    top_rules = association_rules.nlargest(10, 'lift')[['antecedents', 'consequents', 'support', 'confidence', 'lift']]
-    top_rules = top_rules.round(4)
+    rule_store = data.get('rule_store')
+    anomaly_results = data.get('anomaly_results')
+    item_options = [{'label': item, 'value': item} for item in rule_store.items]
+    max_support = float(np.ceil(np.nanmax(rule_store.metrics['support'], initial=0) * 10) / 10) or 1.0
     
-    top_lift = association_rules.nlargest(8, 'lift').copy()
+    top_lift = rule_store.frame(rule_store.top('lift', 8))
     top_lift['Rule'] = top_lift['antecedents'] + ' → ' + top_lift['consequents']
     
     fig_lift = go.Figure(go.Bar(
@@ -789,22 +1162,7 @@ def page_4_layout():
         yaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b', size=11), categoryorder='total ascending')
     )
     
-    fig_anomaly = go.Figure()
-    normal = anomaly_results[anomaly_results['Is_Anomaly'] == 0]
-    anomalies = anomaly_results[anomaly_results['Is_Anomaly'] == 1]
-    
-    fig_anomaly.add_trace(go.Scatter(x=normal['pca1'], y=normal['pca2'], mode='markers', name='Normal',
-        marker=dict(size=8, color='#6366f1', opacity=0.7, line=dict(width=1, color='white'))))
-    fig_anomaly.add_trace(go.Scatter(x=anomalies['pca1'], y=anomalies['pca2'], mode='markers', name='Anomaly',
-        marker=dict(size=12, color='#ef4444', opacity=0.9, symbol='x', line=dict(width=2, color='white'))))
-    
-    fig_anomaly.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=320,
-        font=dict(color='#334155'), margin=dict(l=50, r=30, t=20, b=50),
-        xaxis=dict(title='PC1', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
-        yaxis=dict(title='PC2', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
-        legend=dict(font=dict(color='#334155'), bgcolor='rgba(0,0,0,0)')
-    )
+    fig_anomaly = build_anomaly_scatter(anomaly_results)
     
     anomaly_count = anomaly_results['Is_Anomaly'].sum()
     anomaly_pct = anomaly_count / len(anomaly_results) * 100
@@ -816,8 +1174,8 @@ def page_4_layout():
         ]),
         
         dbc.Row([
-            dbc.Col(create_kpi_card("Total Rules", f"{len(association_rules)}", "fas fa-link", "kpi-card-orange", "kpi-icon-orange"), lg=3, md=6, className="mb-4"),
-            dbc.Col(create_kpi_card("Max Lift", f"{association_rules['lift'].max():.2f}", "fas fa-arrow-up", "kpi-card-pink", "kpi-icon-pink"), lg=3, md=6, className="mb-4"),
+            dbc.Col(create_kpi_card("Total Rules", f"{len(rule_store)}", "fas fa-link", "kpi-card-orange", "kpi-icon-orange"), lg=3, md=6, className="mb-4"),
+            dbc.Col(create_kpi_card("Max Lift", f"{np.nanmax(rule_store.metrics['lift'], initial=0):.2f}", "fas fa-arrow-up", "kpi-card-pink", "kpi-icon-pink"), lg=3, md=6, className="mb-4"),
             dbc.Col(create_kpi_card("Anomalies", f"{anomaly_count}", "fas fa-exclamation-triangle", "kpi-card-purple", "kpi-icon-purple"), lg=3, md=6, className="mb-4"),
             dbc.Col(create_kpi_card("Anomaly Rate", f"{anomaly_pct:.1f}%", "fas fa-percentage", "kpi-card-cyan", "kpi-icon-cyan"), lg=3, md=6, className="mb-4"),
         ]),
@@ -825,7 +1183,7 @@ def page_4_layout():
         dbc.Row([
             dbc.Col([
                 create_glass_card("Association Rules - Top by Lift", [
-                    dcc.Graph(figure=fig_lift, config={'displayModeBar': False}),
+                    stored_graph('lift', fig_lift, config={'displayModeBar': False}),
                     html.Div([
                         html.Div([
                             html.I(className="fas fa-lightbulb", style={"color": "#f59e0b", "marginRight": "10px"}),
@@ -848,7 +1206,7 @@ def page_4_layout():
             
             dbc.Col([
                 create_glass_card("Anomaly Detection", [
-                    dcc.Graph(figure=fig_anomaly, config={'displayModeBar': False}),
+                    stored_graph('anomaly', fig_anomaly, config={'displayModeBar': False}),
                     dbc.Row([
                         dbc.Col([
                             html.Div([
@@ -869,8 +1227,35 @@ def page_4_layout():
         
         dbc.Row([
             dbc.Col([
-                create_glass_card("Top Association Rules", [
-                    dbc.Table.from_dataframe(top_rules, striped=False, bordered=False, hover=True, className="premium-table", size='sm')
+                create_glass_card("Rule Explorer", [
+                    dbc.Row([
+                        dbc.Col([
+                            html.Label("Antecedent Item", className="filter-label"),
+                            dcc.Dropdown(id='rule-antecedent', options=item_options, placeholder="Any item")
+                        ], lg=3, md=6, className="mb-3"),
+                        dbc.Col([
+                            html.Label("Consequent Item", className="filter-label"),
+                            dcc.Dropdown(id='rule-consequent', options=item_options, placeholder="Any item")
+                        ], lg=3, md=6, className="mb-3"),
+                        dbc.Col([
+                            html.Label("Min Support", className="filter-label"),
+                            dcc.Slider(id='rule-min-support', min=0, max=max_support, step=0.01, value=0,
+                                marks={0: {'label': '0', 'style': {'color': '#64748b'}}, max_support: {'label': f'{max_support:g}', 'style': {'color': '#64748b'}}})
+                        ], lg=2, md=6, className="mb-3"),
+                        dbc.Col([
+                            html.Label("Min Confidence", className="filter-label"),
+                            dcc.Slider(id='rule-min-confidence', min=0, max=1, step=0.05, value=0,
+                                marks={0: {'label': '0', 'style': {'color': '#64748b'}}, 0.5: {'label': '0.5', 'style': {'color': '#64748b'}}, 1: {'label': '1', 'style': {'color': '#64748b'}}})
+                        ], lg=2, md=6, className="mb-3"),
+                        dbc.Col([
+                            html.Label("Rank By", className="filter-label"),
+                            dcc.Dropdown(id='rule-sort', options=[{'label': m.capitalize(), 'value': m} for m in ('lift', 'confidence', 'support')],
+                                value='lift', clearable=False)
+                        ], lg=2, md=6, className="mb-3"),
+                    ]),
+                    html.Div(id='rule-explorer-summary', style={"color": "#64748b", "fontSize": "13px", "marginBottom": "8px"}),
+                    html.Div(id='rule-explorer-table'),
+                    dbc.Pagination(id='rule-page', max_value=1, active_page=1, fully_expanded=False, size='sm', className="mt-2")
                 ], icon="fa-table")
             ], width=12)
         ])
@@ -974,17 +1359,110 @@ def page_5_layout():
                 
                 create_glass_card("Customer vs Population Comparison", [
                     dcc.Graph(id='customer-profile-chart', figure=go.Figure().update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=250, margin=dict(l=50,r=30,t=30,b=50), annotations=[dict(text='Click "Generate Prediction" to see comparison', x=0.5, y=0.5, xref='paper', yref='paper', showarrow=False, font=dict(size=14, color='#94a3b8'))]), style={"height": "280px"}, config={'displayModeBar': False})
-                ], icon="fa-chart-bar")
+                ], icon="fa-chart-bar"),
+                
+                create_glass_card(f"{SIMILAR_CUSTOMERS} Most Similar Customers", [
+                    html.Div(id='similar-customers', children=html.P('Click "Generate Prediction" to find similar customers',
+                                                                     style={"color": "#94a3b8", "margin": 0}))
+                ], icon="fa-users")
             ], lg=8, md=12),
         ])
     ])
 
+# ============================================================================
+# ADMIN: CALLBACK PROFILES
+# ============================================================================
+
+def profiles_layout():
+    captures = profiler.captures()
+    rows = []
+    for c in captures:
+        name = c['name']
+        raw = name + ('.prof' if c.get('kind') == 'cprofile' else '.folded')
+        inputs = json.dumps([(i.get('id'), i.get('value')) for i in (c.get('inputs') or []) + (c.get('state') or [])],
+                            default=str) if 'truncated' not in c else c['truncated'][:200] + '…'
+        top = c.get('top') or []
+        rows.append(html.Tr([
+            html.Td(pd.Timestamp(c['time'], unit='s').strftime('%Y-%m-%d %H:%M:%S')),
+            html.Td(c.get('callback')),
+            html.Td(f"{c['wall_seconds'] * 1e3:,.0f} ms"),
+            html.Td(f"{c['cpu_seconds'] * 1e3:,.0f} ms"),
+            html.Td(c.get('trigger')),
+            html.Td(html.Code(inputs[:300]), style={"maxWidth": "360px", "wordBreak": "break-all"}),
+            html.Td(html.Code(top[0][0]) if top else "--"),
+            html.Td([html.A("json", href=app.get_relative_path(f"/admin/profiles/{name}.json"), target="_blank"), " · ",
+                     html.A(raw.rsplit('.', 1)[-1], href=app.get_relative_path(f"/admin/profiles/{raw}"), target="_blank")]),
+        ]))
+    header = html.Thead(html.Tr([html.Th(h) for h in
+                                 ["Captured", "Callback", "Wall", "CPU", "Trigger", "Inputs", "Hottest frame", "Files"]]))
+    return html.Div([
+        html.Div([
+            html.H1("Callback Profiles", className="page-title"),
+            html.P(f"Slowest captured callbacks (threshold {profiler.threshold:g}s, "
+                   f"cProfile sample rate {profiler.sample_rate:g})", className="page-subtitle"),
+        ]),
+        create_glass_card(f"{len(captures)} captures", [
+            dbc.Table([header, html.Tbody(rows)], bordered=False, hover=True, className="premium-table", size='sm')
+            if rows else html.P("No captures yet.", style={"color": "#94a3b8"})
+        ], icon="fa-stopwatch"),
+    ])
+
 # ============================================================================
 # CALLBACKS
 # ============================================================================
 
-@app.callback(Output("page-content", "children"), [Input("url", "pathname")])
-def render_page_content(pathname):
+def data_status_layout(names, failed=False):
+    if failed:
+        icon, title = "fas fa-exclamation-triangle", "Data Unavailable"
+        detail = [f"{n}: {data.error(n)}" for n in names]
+    else:
+        icon, title = "fas fa-circle-notch fa-spin", "Loading Data"
+        detail = [f"{n}: {data.status(n)}" for n in names]
+    return html.Div([
+        html.Div([
+            html.I(className=icon, style={"fontSize": "48px", "color": "#6366f1", "marginBottom": "24px"}),
+            html.H2(title, style={"color": "#1e293b", "fontWeight": "700"}),
+            html.Div([html.P(d, style={"color": "#94a3b8", "marginBottom": "4px", "fontSize": "13px"}) for d in detail],
+                     style={"marginTop": "16px"}),
+        ], style={"textAlign": "center", "padding": "80px 20px"})
+    ])
+
+@app.callback(
+    [Output("page-content", "children"),
+     Output("data-poll", "disabled")],
+    [Input("url", "pathname"),
+     Input("data-poll", "n_intervals")]
+)
+def render_page_content(pathname, n_intervals):
+    # Drop datasets whose CSVs changed, then only wait for the datasets this
+    # page uses; keep polling until they are loaded
+    data.refresh()
+    needed = PAGE_DATASETS.get(pathname, [])
+    if not data.ready(*needed):
+        failed = [n for n in needed if data.status(n) == 'error']
+        if failed and dash.ctx.triggered_id != "url":
+            return data_status_layout(failed, failed=True), True
+        data.prefetch(needed, retry=True)
+        return data_status_layout([n for n in needed if not data.ready(n)]), False
+    return build_page(pathname), True
+
+# Page layouts depend on nothing but the loaded data, so each page's component
+# tree is built once per data version and reused on every navigation. Layouts
+# embed /_figure/<digest> URLs, so the key also carries the figure store's
+# generation: once a stored figure may have been evicted, layouts are rebuilt
+# (re-storing their figures) instead of linking to a missing one.
+page_layout_cache = FigureCache(maxsize=32)
+
+def build_page(pathname):
+    if pathname not in PAGE_DATASETS:
+        return page_layout(pathname)
+    key = ('layout', pathname, data.version(*PAGE_DATASETS[pathname]), figure_store.generation)
+    def build():
+        with metrics.timer('page_layout', page=pathname):
+            return page_layout(pathname)
+    return page_layout_cache.get_or_compute(key, build)
+
+def page_layout(pathname):
     if pathname == "/":
         return page_1_layout()
     elif pathname == "/page-2":
@@ -995,6 +1473,8 @@ def render_page_content(pathname):
         return page_4_layout()
     elif pathname == "/page-5":
         return page_5_layout()
+    elif pathname == "/admin/profiles" and profiler.authorized():
+        return profiles_layout()
     return html.Div([
         html.Div([
             html.H1("404", style={"fontSize": "72px", "fontWeight": "800", "color": "#6366f1", "marginBottom": "0"}),
@@ -1003,6 +1483,19 @@ def render_page_content(pathname):
         ], style={"textAlign": "center", "padding": "80px 20px"})
     ])
 
+# Static page figures: fetch the pre-encoded JSON (the browser revalidates it by ETag)
+app.clientside_callback(
+    """
+    async function(src) {
+        if (!src) { return window.dash_clientside.no_update; }
+        const response = await fetch(src);
+        return response.ok ? response.json() : window.dash_clientside.no_update;
+    }
+    """,
+    Output({'type': 'stored-figure', 'index': MATCH}, 'figure'),
+    Input({'type': 'figure-src', 'index': MATCH}, 'data')
+)
+
 # Page 1 Callbacks
 @app.callback(
     [Output('age-histogram', 'figure'),
@@ -1013,35 +1506,56 @@ def render_page_content(pathname):
      Input('marital-filter', 'value')]
 )
 def update_page1_charts(age_filter, education_filter, campaign_filter, marital_filter):
-    filtered = combined_data.copy()
+    return cached_page1_figures(age_filter, education_filter, campaign_filter, marital_filter)
+
+def cached_page1_figures(*filters):
+    # Cleared dropdowns (None) mean the same as 'All'
+    filters = tuple('All' if f is None else f for f in filters)
+    index = data.get('overview_index')
+    key = ('page1', PAGE1_FIGURES_VERSION, data.version('overview_index'), filters)
+    return page1_figure_cache.get_or_compute(
+        key, lambda: [json.loads(fig.to_json()) for fig in build_page1_figures(index, *filters)])
+
+def warm_page1_figure_cache():
+    options = page1_filter_options(data.get('combined_data'))
+    for filters in itertools.product(['All'] + options['age'], ['All'] + options['education'],
+                                     ['All'] + options['campaign'], ['All'] + options['marital']):
+        cached_page1_figures(*filters)
+
+def build_page1_figures(index, age_filter, education_filter, campaign_filter, marital_filter):
+    # Row selection is an AND of precomputed per-value bitmaps (see filter_index.py)
+    mask = index.mask({'Age_Group': age_filter, 'Education': education_filter,
+                       'Campaign_Type': campaign_filter, 'Marital_Status': marital_filter})
+    metrics.add_rows(index.size)
     
-    if age_filter != 'All':
-        filtered = filtered[filtered['Age_Group'] == age_filter]
-    if education_filter != 'All':
-        filtered = filtered[filtered['Education'] == education_filter]
-    if campaign_filter != 'All':
-        filtered = filtered[filtered['Campaign_Type'] == campaign_filter]
-    if marital_filter != 'All':
-        filtered = filtered[filtered['Marital_Status'] == marital_filter]
-    
-    fig_age = px.histogram(filtered, x='Age', nbins=20, color='Campaign_Type',
-                           color_discrete_map={'Bank': '#6366f1', 'Retail': '#ec4899'})
+    # Binned server-side with fixed edges: only 20 bar heights per campaign type
+    # are sent to the browser instead of every selected row's age
+    edges, age_counts = index.histogram(mask, 'Age')
+    bin_width = float(edges[1] - edges[0])
+    fig_age = go.Figure()
+    for campaign, color in [('Bank', '#6366f1'), ('Retail', '#ec4899')]:
+        if campaign in age_counts:
+            fig_age.add_trace(go.Bar(
+                name=campaign, x0=float(edges[0]) + bin_width / 2, dx=bin_width, width=bin_width,
+                y=age_counts[campaign].tolist(), marker_color=color,
+                hovertemplate='Age=%{x}<br>count=%{y}<extra>' + campaign + '</extra>'
+            ))
     fig_age.update_layout(
         paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
         font=dict(color='#334155'), height=290, bargap=0.1,
-        margin=dict(l=50, r=30, t=30, b=50), showlegend=True,
-        legend=dict(font=dict(color='#334155'), bgcolor='rgba(0,0,0,0)'),
-        xaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
-        yaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
+        margin=dict(l=50, r=30, t=30, b=50), showlegend=True, barmode='relative',
+        legend=dict(font=dict(color='#334155'), bgcolor='rgba(0,0,0,0)', title_text='Campaign_Type'),
+        xaxis=dict(title='Age', gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
+        yaxis=dict(title='count', gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
     )
     
-    response_counts = filtered.groupby(['Campaign_Type', 'Response']).size().reset_index(name='Count')
+    response_counts = index.group_counts(mask, 'Response')
     fig_response = go.Figure()
     for resp, color in [(0, '#ef4444'), (1, '#10b981')]:
-        data = response_counts[response_counts['Response'] == resp]
+        campaigns = [c for c, counts in response_counts.items() if counts.get(resp)]
         fig_response.add_trace(go.Bar(
             name=f'{"Responded" if resp == 1 else "No Response"}',
-            x=data['Campaign_Type'], y=data['Count'],
+            x=campaigns, y=[response_counts[c][resp] for c in campaigns],
             marker_color=color
         ))
     fig_response.update_layout(
@@ -1056,6 +1570,8 @@ def update_page1_charts(age_filter, education_filter, campaign_filter, marital_f
     return fig_age, fig_response
 
 # Page 3 Callbacks
+# A grid-index lookup of a few ms: it stays in the request, where a background
+# job's fork and polling would cost far more than the work
 @app.callback(
     Output('pca-cluster-chart', 'figure'),
     [Input('cluster-filter', 'value'),
@@ -1063,36 +1579,84 @@ def update_page1_charts(age_filter, education_filter, campaign_filter, marital_f
      Input('recency-range', 'value')]
 )
 def update_cluster_chart(cluster_filter, income_range, recency_range):
-    colors_cluster = ['#6366f1', '#ec4899', '#10b981', '#f59e0b']
-    filtered = clustering_results.copy()
-    
-    if cluster_filter != 'All':
-        filtered = filtered[filtered['cluster'] == cluster_filter]
-    
-    filtered = filtered[(filtered['Income'] >= income_range[0]) & (filtered['Income'] <= income_range[1])]
-    filtered = filtered[(filtered['Recency'] >= recency_range[0]) & (filtered['Recency'] <= recency_range[1])]
-    
-    # Convert cluster to string for discrete coloring (use .loc to avoid SettingWithCopyWarning)
-    filtered = filtered.copy()
-    filtered['cluster_str'] = filtered['cluster'].astype(str)
+    clustering_results = data.get('clustering_results')
+    rows = data.get('cluster_range_index').select(
+        cluster_filter, {'Income': income_range, 'Recency': recency_range})
+    filtered = clustering_results.iloc[rows]
+    metrics.add_rows(len(rows))
     
     # Dynamic color mapping based on actual clusters in CSV
     unique_clusters = sorted(clustering_results['cluster'].unique())
-    cluster_color_map = {str(c): colors_cluster[i % len(colors_cluster)] for i, c in enumerate(unique_clusters)}
+    return build_cluster_scatter(filtered, unique_clusters, height=350)
+
+@heavy_callback(
+    app, callback_manager,
+    Output('rerun-result', 'children'),
+    Input('rerun-btn', 'n_clicks'),
+    State('rerun-k', 'value'),
+    progress=[Output('rerun-progress', 'value'), Output('rerun-progress', 'label')],
+    running=[(Output('rerun-btn', 'disabled'), True, False),
+             (Output('rerun-cancel', 'disabled'), False, True)],
+    cancel=[Input('rerun-cancel', 'n_clicks')],
+    prevent_initial_call=True
+)
+def rerun_segmentation(set_progress, n_clicks, k):
+    """Preview a fresh segmentation with ``k`` clusters (the dashboard keeps its current one)."""
+    retail_data = data.get('retail_data')
+    metrics.add_rows(len(retail_data))
     
-    fig = px.scatter(filtered, x='pca1', y='pca2', color='cluster_str',
-                     labels={'pca1': 'PC1', 'pca2': 'PC2', 'cluster_str': 'Segment'},
-                     color_discrete_map=cluster_color_map,
-                     hover_data=['Income', 'MntWines', 'Recency'])
-    fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=350,
-        font=dict(color='#334155'), margin=dict(l=50, r=30, t=30, b=50),
-        xaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b')),
-        yaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
-    )
-    fig.update_traces(marker=dict(size=10, opacity=0.8, line=dict(width=1, color='white')))
+    def report(steps, max_steps):
+        set_progress((round(100 * steps / max_steps), f"{steps}/{max_steps} steps"))
     
-    return fig
+    model = fit_clusters(retail_data, k=k, progress=report)
+    sizes = np.zeros(model.k, dtype=int)
+    for chunk in iter_chunks(retail_data):
+        sizes += np.bincount(model.assign(model.standardize(feature_matrix(chunk))), minlength=model.k)
+    
+    centers = model.centers
+    labels = segment_labels(centers)
+    summary = pd.DataFrame({
+        'ID': centers.index, 'Segment Type': [labels[c] for c in centers.index], 'Size': sizes,
+        'Avg Income': centers['Income'], 'Avg Spending': centers['MntWines'] + centers['MntMeatProducts'],
+        'Recency': centers['Recency'],
+    }).round(0)
+    return html.Div([
+        html.P(f"{model.k} segments over {len(retail_data):,} customers (preview only)",
+               style={"color": "#334155", "fontSize": "14px"}),
+        dbc.Table.from_dataframe(summary, striped=False, bordered=False, hover=True, className="premium-table", size='sm'),
+    ])
+
+# Page 4 Callbacks
+RULES_PAGE_SIZE = 10
+
+@app.callback(
+    [Output('rule-explorer-table', 'children'),
+     Output('rule-explorer-summary', 'children'),
+     Output('rule-page', 'max_value'),
+     Output('rule-page', 'active_page')],
+    [Input('rule-antecedent', 'value'),
+     Input('rule-consequent', 'value'),
+     Input('rule-min-support', 'value'),
+     Input('rule-min-confidence', 'value'),
+     Input('rule-sort', 'value'),
+     Input('rule-page', 'active_page')]
+)
+def update_rule_explorer(antecedent, consequent, min_support, min_confidence, sort_by, active_page):
+    # Filter changes go back to the first page; paging only slices the ranked postings
+    page = (active_page or 1) if dash.ctx.triggered_id == 'rule-page' else 1
+    rule_store = data.get('rule_store')
+    rule_ids, total = rule_store.query(
+        antecedent, consequent, min_support=min_support or 0, min_confidence=min_confidence or 0,
+        sort_by=sort_by or 'lift', offset=(page - 1) * RULES_PAGE_SIZE, limit=RULES_PAGE_SIZE)
+    metrics.add_rows(total)
+    
+    if total == 0:
+        return html.P("No rules match these filters.", style={"color": "#94a3b8"}), "0 rules", 1, 1
+    rules = rule_store.frame(rule_ids).round(4)
+    first = (page - 1) * RULES_PAGE_SIZE + 1
+    summary = f"Rules {first:,}–{first + len(rules) - 1:,} of {total:,}, ranked by {sort_by or 'lift'}"
+    table = dbc.Table.from_dataframe(rules, striped=False, bordered=False, hover=True, className="premium-table", size='sm')
+    return table, summary, max(1, -(-total // RULES_PAGE_SIZE)), page
 
 # Page 5 Callbacks
 @app.callback(
@@ -1102,7 +1666,8 @@ def update_cluster_chart(cluster_filter, income_range, recency_range):
      Output('output-strategy', 'children'),
      Output('output-strategy-desc', 'children'),
      Output('probability-gauge', 'figure'),
-     Output('customer-profile-chart', 'figure')],
+     Output('customer-profile-chart', 'figure'),
+     Output('similar-customers', 'children')],
     [Input('predict-btn', 'n_clicks')],
     [State('input-age', 'value'),
      State('input-income', 'value'),
@@ -1115,35 +1680,17 @@ def predict_customer(n_clicks, age, income, spending, recency):
     if age is None or income is None or spending is None or recency is None:
         empty_fig = go.Figure()
         empty_fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=100)
-        return "--", "--", "Enter values", "--", "Click predict", empty_fig, empty_fig
+        return "--", "--", "Enter values", "--", "Click predict", empty_fig, empty_fig, "Enter values"
+    prediction_model = data.get('prediction_model')
+    cluster_stats = data.get('cluster_stats')
+    metrics.add_rows(1)
+    cluster_labels = data.get('cluster_labels')
     # =========================================================================
-    # 1. PREDICTED SEGMENT - Using K-Means from clustering_results.csv
+    # 1. PREDICTED SEGMENT + 2. RESPONSE PROBABILITY
     # =========================================================================
-    # Calculate cluster centers from actual clustering data
-    cluster_centers = clustering_results.groupby('cluster').agg({
-        'Income': 'mean',
-        'MntWines': 'mean',
-        'MntMeatProducts': 'mean',
-        'Recency': 'mean'
-    }).reset_index()
-    
-    # Find nearest cluster based on Euclidean distance (normalized)
-    income_max = clustering_results['Income'].max() or 1  # Prevent division by zero
-    spending_max = (clustering_results['MntWines'] + clustering_results['MntMeatProducts']).max() or 1
-    recency_max = clustering_results['Recency'].max() or 1
-    
-    min_dist = float('inf')
-    predicted_cluster = 0
-    for _, center in cluster_centers.iterrows():
-        center_spending = center['MntWines'] + center['MntMeatProducts']
-        dist = (
-            ((income - center['Income']) / income_max) ** 2 +
-            ((spending - center_spending) / spending_max) ** 2 +
-            ((recency - center['Recency']) / recency_max) ** 2
-        ) ** 0.5
-        if dist < min_dist:
-            min_dist = dist
-            predicted_cluster = int(center['cluster'])
+    # Nearest K-Means center from clustering_results.csv, with the cluster's
+    # response rate adjusted by income/recency (see PredictionModel)
+    predicted_cluster, probability = prediction_model.predict(income, spending, recency)
     
     # Map cluster to segment name from cluster_labels (defined from CSV analysis)
     segment = cluster_labels.get(predicted_cluster, f"Cluster {predicted_cluster}")
@@ -1157,56 +1704,17 @@ def predict_customer(n_clicks, age, income, spending, recency):
     
     segment_desc = get_cluster_avg_income(predicted_cluster)
     
-    # =========================================================================
-    # 2. PREDICTED RESPONSE PROBABILITY - Based on cluster analysis from CSV
-    # =========================================================================
-    # Calculate probability based on cluster response rates from retail_data
-    # Merge cluster info with response data
-    cluster_data = clustering_results[['ID', 'cluster']].copy()
-    retail_with_cluster = retail_data.merge(cluster_data, on='ID', how='left')
-    
-    # Get response rate for the predicted cluster (handle NaN safely)
-    retail_with_cluster = retail_with_cluster.dropna(subset=['cluster'])  # Remove NaN clusters
-    cluster_response_rates = retail_with_cluster.groupby('cluster')['Response'].mean()
-    
-    # Safely get base probability with fallback
-    if predicted_cluster in cluster_response_rates.index:
-        base_probability = cluster_response_rates[predicted_cluster]
-    else:
-        base_probability = retail_data['Response'].mean()
-    
-    # Ensure base_probability is a valid number
-    if pd.isna(base_probability):
-        base_probability = retail_data['Response'].mean()
-    
-    # Adjust probability based on customer features relative to cluster average (with safety checks)
-    cluster_subset = cluster_centers[cluster_centers['cluster'] == predicted_cluster]
-    if len(cluster_subset) > 0:
-        cluster_avg_income = cluster_subset['Income'].values[0]
-        cluster_avg_recency = cluster_subset['Recency'].values[0]
-    else:
-        cluster_avg_income = clustering_results['Income'].mean()
-        cluster_avg_recency = clustering_results['Recency'].mean()
-    
-    income_factor = 1.0 + 0.2 * ((income - cluster_avg_income) / cluster_avg_income) if cluster_avg_income > 0 else 1.0
-    recency_factor = 1.0 + 0.1 * ((cluster_avg_recency - recency) / cluster_avg_recency) if cluster_avg_recency > 0 else 1.0
-    
-    probability = base_probability * income_factor * recency_factor
-    probability = max(0.05, min(0.95, probability))  # Clamp between 5% and 95%
-    
     # =========================================================================
     # 3. STRATEGY RECOMMENDATION - Rule-based on probability + income
     # =========================================================================
-    avg_income_population = retail_data['Income'].mean()
+    avg_income_population = prediction_model.population_income
+    strategy = str(prediction_model.strategies(np.array([probability]), np.array([income]))[0])
     
-    if probability >= 0.5 and income >= avg_income_population:
-        strategy = "High Value"
+    if strategy == "High Value":
         strategy_desc = f"High probability ({probability:.0%}) + Above avg income (${income:,} > ${avg_income_population:,.0f})"
-    elif probability >= 0.3:
-        strategy = "Medium Priority"
+    elif strategy == "Medium Priority":
         strategy_desc = f"Medium probability ({probability:.0%}). Standard campaign recommended."
     else:
-        strategy = "Low Investment"
         strategy_desc = f"Low probability ({probability:.0%}). Minimal marketing spend suggested."
     
     # =========================================================================
@@ -1237,10 +1745,10 @@ def predict_customer(n_clicks, age, income, spending, recency):
     # =========================================================================
     # 4. COMPARISON CHART - Population averages from marketing_campaign.csv
     # =========================================================================
-    # Actual averages from retail_data (marketing_campaign.csv)
-    avg_income = retail_data['Income'].mean()
-    avg_spending = retail_data['Total_Spending'].mean()
-    avg_recency = retail_data['Recency'].mean()
+    # Actual averages from retail_data (marketing_campaign.csv), precomputed
+    avg_income = prediction_model.population_income
+    avg_spending = prediction_model.population_spending
+    avg_recency = prediction_model.population_recency
     
     fig_profile = go.Figure()
     fig_profile.add_trace(go.Bar(
@@ -1251,7 +1759,7 @@ def predict_customer(n_clicks, age, income, spending, recency):
         textposition='outside', textfont=dict(color='#334155', size=11)
     ))
     fig_profile.add_trace(go.Bar(
-        name=f'Population Avg (n={len(retail_data):,})', x=['Income (K$)', 'Spending ($)', 'Recency (days)'],
+        name=f'Population Avg (n={prediction_model.population_size:,})', x=['Income (K$)', 'Spending ($)', 'Recency (days)'],
         y=[avg_income / 1000, avg_spending, avg_recency],
         marker=dict(color='#cbd5e1', line=dict(width=0)),
         text=[f'{avg_income/1000:.1f}K', f'${avg_spending:.0f}', f'{avg_recency:.0f}d'],
@@ -1266,7 +1774,242 @@ def predict_customer(n_clicks, age, income, spending, recency):
         yaxis=dict(gridcolor='#e2e8f0', tickfont=dict(color='#64748b'))
     )
     
-    return (f"{probability:.0%}", segment, segment_desc, strategy, strategy_desc, fig_gauge, fig_profile)
+    # =========================================================================
+    # 5. SIMILAR CUSTOMERS - Nearest real retail customers and how they responded
+    # =========================================================================
+    similar = data.get('similar_customers').query(income, spending, recency)
+    similar_rate = similar['Response'].mean()
+    similar_table = pd.DataFrame({
+        'ID': similar['ID'], 'Income': similar['Income'].map('${:,.0f}'.format),
+        'Spending': similar['Spending'].map('${:,.0f}'.format), 'Recency': similar['Recency'].map('{:.0f}d'.format),
+        'Responded': np.where(similar['Response'] == 1, 'Yes', 'No'), 'Distance': similar['Distance'].round(3),
+    })
+    similar_customers = html.Div([
+        html.P([html.Strong(f"{similar_rate:.0%}"),
+                f" of the {len(similar)} most similar customers responded "
+                f"(population {prediction_model.population_response:.0%})"],
+               style={"color": "#334155", "fontSize": "14px"}),
+        dbc.Table.from_dataframe(similar_table, striped=False, bordered=False, hover=True, className="premium-table", size='sm'),
+    ])
+    
+    return (f"{probability:.0%}", segment, segment_desc, strategy, strategy_desc, fig_gauge, fig_profile, similar_customers)
+
+# ============================================================================
+# API ROUTES
+# ============================================================================
+
+SCORE_COLUMNS = ['age', 'income', 'spending', 'recency']
+
+def read_upload_frame():
+    # Multipart file upload, JSON records/columns, or a raw CSV body
+    if 'file' in request.files:
+        return pd.read_csv(request.files['file'])
+    if request.is_json:
+        payload = request.get_json()
+        if isinstance(payload, dict) and 'customers' in payload:
+            payload = payload['customers']
+        return pd.DataFrame(payload)
+    return pd.read_csv(io.StringIO(request.get_data(as_text=True)))
+
+@server.route('/api/score', methods=['POST'])
+def api_score():
+    """Batch scoring: segment, probability and strategy for every uploaded customer."""
+    try:
+        uploaded = read_upload_frame()
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        return jsonify(error=f"Could not parse upload: {e}"), 400
+    uploaded.columns = [str(c).strip().lower() for c in uploaded.columns]
+    
+    missing = [c for c in SCORE_COLUMNS if c not in uploaded.columns]
+    if missing:
+        return jsonify(error=f"Missing columns: {', '.join(missing)}", required=SCORE_COLUMNS), 400
+    
+    values = uploaded[SCORE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    invalid = np.flatnonzero(values.isna().any(axis=1).to_numpy())
+    if len(invalid):
+        return jsonify(error="Non-numeric or empty values", rows=invalid[:20].tolist()), 400
+    
+    scored = data.get('prediction_model').score_frame(values)
+    if 'id' in uploaded.columns:
+        scored.insert(0, 'id', uploaded['id'].to_numpy())
+    return scored_response(scored)
+
+@server.route('/api/anomaly-score', methods=['POST'])
+def api_anomaly_score():
+    """Isolation Forest score, IsoForest_Score (negative = anomaly) and Is_Anomaly for uploaded retail rows."""
+    try:
+        uploaded = read_upload_frame()
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        return jsonify(error=f"Could not parse upload: {e}"), 400
+    # Retail column names, matched case-insensitively
+    columns = {str(c).strip().lower(): c for c in uploaded.columns}
+    missing = [c for c in ANOMALY_FEATURES if c.lower() not in columns]
+    if missing:
+        return jsonify(error=f"Missing columns: {', '.join(missing)}", required=ANOMALY_FEATURES), 400
+    
+    values = pd.DataFrame({c: pd.to_numeric(uploaded[columns[c.lower()]], errors='coerce') for c in ANOMALY_FEATURES})
+    # NaN (unparsed or empty) and ±inf alike: an infinite value walks a row past its leaf
+    invalid = np.flatnonzero(~np.isfinite(values.to_numpy(dtype=float)).all(axis=1))
+    if len(invalid):
+        return jsonify(error="Non-numeric, empty or infinite values", rows=invalid[:20].tolist()), 400
+    
+    scored = data.get('anomaly_model').score_frame(values)
+    if 'id' in columns:
+        scored.insert(0, 'id', uploaded[columns['id']].to_numpy())
+    return scored_response(scored)
+
+def scored_response(scored):
+    # JSON records unless CSV is asked for (?format=csv or Accept: text/csv)
+    if request.args.get('format') == 'csv' or \
+            request.accept_mimetypes.best_match(['application/json', 'text/csv']) == 'text/csv':
+        return Response(scored.to_csv(index=False), mimetype='text/csv')
+    return Response(scored.to_json(orient='records'), mimetype='application/json')
+
+# How one preprocessed batch of a raw dataset updates what is derived from it.
+# Each entry swaps in an updated value with O(batch) work; anything not listed
+# (indexes, the prediction model, cached layouts and figures) is versioned on
+# these datasets and rebuilt on next use.
+INGEST_UPDATES = {
+    'bank_data': [
+        ('combined_data', lambda combined, batch: append_rows(combined, combine(batch, None))),
+        ('cohort_cube', lambda cube, batch: cube.updated(batch)),
+    ],
+    'retail_data': [
+        ('combined_data', lambda combined, batch: append_rows(combined, combine(None, batch))),
+        ('cohort_cube', lambda cube, batch: cube.updated(with_clusters(batch))),
+        # The model first, so the batch is flagged against a threshold that includes it
+        ('anomaly_model', lambda model, batch: model.updated(batch)),
+        ('anomaly_results', lambda results, batch: append_rows(results, data.get('anomaly_model').transform(batch))),
+    ],
+    'clustering_results': [
+        ('cluster_moments', lambda moments, batch: moments.updated(batch)),
+        # Customers may change cluster, so the cohort cube is rebuilt on next use
+        ('cluster_membership', lambda membership, batch: build_cluster_membership(membership, batch)),
+    ],
+}
+ingest_lock = threading.Lock()
+
+def append_rows(frame, batch):
+    return concat_chunks([frame, batch])
+
+def ingest_rows(name, rows):
+    """Persist raw rows, then apply them to every loaded dataset derived from them."""
+    if name == 'clustering_results' and CLUSTER_SOURCE == 'compute':
+        raise ValueError("clustering_results is computed from retail_data; ingest retail rows instead")
+    with ingest_lock:
+        if name == 'bank_data':
+            prepare = preprocess_bank
+        elif name == 'retail_data':
+            income_fill = data.get('retail_income_fill')
+            prepare = lambda rows: preprocess_retail(rows, income_fill=income_fill)
+        else:
+            prepare = None
+        batch = write_batch(name, rows, prepare)
+        data.update(name, lambda frame: append_rows(frame, batch))
+        for dependent, apply in INGEST_UPDATES[name]:
+            data.update(dependent, lambda value: apply(value, batch))
+        return data.refresh()
+
+@server.route('/api/ingest/<name>', methods=['POST'])
+def api_ingest(name):
+    """Append new rows (JSON records, CSV body or file upload) to bank_data, retail_data or clustering_results."""
+    if name not in INGESTABLE:
+        return jsonify(error=f"Unknown dataset: {name}", ingestable=list(INGESTABLE)), 404
+    try:
+        rows = read_upload_frame()
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        return jsonify(error=f"Could not parse upload: {e}"), 400
+    if rows.empty:
+        return jsonify(error="No rows"), 400
+    try:
+        rebuilt = ingest_rows(name, rows)
+    except (ValueError, TypeError, OverflowError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(dataset=name, rows=len(rows), invalidated=sorted(rebuilt))
+
+@server.route('/_figure/<digest>')
+def serve_figure(digest):
+    """Pre-encoded static figure; the digest doubles as a strong ETag."""
+    compressed = figure_store.get(digest)
+    if compressed is None:
+        return jsonify(error="Unknown figure"), 404
+    headers = {'ETag': f'"{digest}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if digest in request.if_none_match:
+        return Response(status=304, headers=headers)
+    if 'gzip' in request.accept_encodings:
+        return Response(compressed, mimetype='application/json', headers=dict(headers, **{'Content-Encoding': 'gzip'}))
+    return Response(gzip.decompress(compressed), mimetype='application/json', headers=headers)
+
+@server.after_request
+def compress_dash_response(response):
+    # Callback outputs carry whole figures; gzip them when the client accepts it
+    if (request.path.rsplit('/', 1)[-1] in ('_dash-update-component', '_dash-layout', '_dash-dependencies')
+            and response.status_code == 200 and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers and 'gzip' in request.accept_encodings):
+        body = response.get_data()
+        if len(body) >= COMPRESS_MIN_BYTES:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+# Registered after the compression hook so response sizes are measured before gzip
+metrics.instrument(app, pages=PAGE_DATASETS)
+profiler.instrument(app)
+
+if profiler.admin_enabled:
+    @server.after_request
+    def remember_admin_token(response):
+        # Opening /admin/profiles?token=... keeps the token in a cookie for the
+        # page's layout callback and its capture links
+        if request.path == app.get_relative_path('/admin/profiles') and 'token' in request.args \
+                and profiler.authorized():
+            response.set_cookie(ADMIN_COOKIE, request.args['token'], httponly=True, samesite='Strict',
+                                secure=request.is_secure, path=app.get_relative_path('/'))
+        return response
+
+    @server.route('/admin/profiles/<filename>')
+    def profile_capture(filename):
+        """Raw capture file: metadata (.json), cProfile stats (.prof) or folded stacks (.folded)."""
+        if not profiler.authorized():
+            return jsonify(error="Forbidden"), 403
+        path = profiler.capture_path(filename)
+        if path is None:
+            return jsonify(error="Unknown capture"), 404
+        with open(path, 'rb') as f:
+            body = f.read()
+        mimetype = 'application/json' if filename.endswith('.json') else 'application/octet-stream'
+        return Response(body, mimetype=mimetype, headers={'Content-Disposition': f'inline; filename="{filename}"'})
+
+@server.route('/api/cache-stats')
+def api_cache_stats():
+    return jsonify(page1_figures=page1_figure_cache.stats(), page_layouts=page_layout_cache.stats(),
+                   figure_store=figure_store.stats())
+
+@server.route('/healthz')
+def healthz():
+    """Liveness plus per-dataset readiness (pending/loading/ready/error)."""
+    statuses = data.statuses()
+    return jsonify(status='ok', ready=all(v == 'ready' for v in statuses.values()), datasets=statuses,
+                   callbacks='background' if callback_manager is not None else 'inline')
+
+# Precompute every Overview filter combination in the background. Started by
+# the first request each process serves rather than at import: under gunicorn
+# --preload the import runs in the master, whose threads do not survive the
+# fork into the workers (and background job processes never serve requests)
+figure_warmup_pid = None
+figure_warmup_lock = threading.Lock()
+
+if os.environ.get('DASHBOARD_WARM_FIGURES', '0') == '1':
+    @server.before_request
+    def start_figure_warmup():
+        global figure_warmup_pid
+        if figure_warmup_pid == os.getpid():
+            return
+        with figure_warmup_lock:
+            if figure_warmup_pid != os.getpid():
+                figure_warmup_pid = os.getpid()
+                threading.Thread(target=warm_page1_figure_cache, daemon=True, name='figure-warmup').start()
 
 # ============================================================================
 # RUN SERVER
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Background execution for the expensive Dash callbacks
+
+With DASHBOARD_BACKGROUND=1 the callbacks registered through
+``heavy_callback`` become Dash background callbacks. The request returns at
+once, the callback runs in a separate process, and the browser polls for
+progress and the result, so gunicorn's sync workers stay free for cheap
+interactions. Jobs and results go through a local diskcache directory shared
+by every worker, so no broker (Redis/Celery) is needed. ``cancel`` inputs
+stop a running job.
+
+Dash's DiskcacheManager needs diskcache, multiprocess and psutil
+(``pip install "dash[diskcache]"``). When any of them is missing, or the mode
+is off, the same callbacks run in the request as before: ``set_progress``
+does nothing and cancel inputs are ignored (and left disabled).
+"""
+
+import functools
+
+try:
+    import diskcache
+    import multiprocess  # noqa: F401  (DiskcacheManager runs jobs with it)
+    import psutil  # noqa: F401  (and cancels them with it)
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+# Finished results are kept this long for the polling browser to collect
+RESULT_EXPIRE_SECONDS = 600
+
+
+def background_manager(directory, enabled=False):
+    """A DiskcacheManager over ``directory``, or None when disabled or unavailable."""
+    if not enabled or diskcache is None:
+        return None
+    return DiskcacheManager(diskcache.Cache(directory), expire=RESULT_EXPIRE_SECONDS)
+
+
+def heavy_callback(app, manager, *args, progress=None, running=None, cancel=None, **kwargs):
+    """``app.callback`` for an expensive callback.
+
+    With a ``manager`` it runs in the background with ``progress``, ``running``
+    and ``cancel`` wired up; without one it runs in the request (``running``
+    still applies, except to the ``cancel`` components). When ``progress`` is given the function takes
+    ``set_progress`` as its first argument either way.
+    """
+    def decorator(func):
+        if manager is not None:
+            return app.callback(*args, background=True, manager=manager, progress=progress,
+                                running=running, cancel=cancel, **kwargs)(func)
+        # Nothing can cancel an inline call, so its cancel components keep their
+        # initial (disabled) state rather than being enabled while it runs
+        cancel_ids = {c.component_id for c in cancel or []}
+        inline_running = [r for r in running or [] if r[0].component_id not in cancel_ids] or None
+        if progress is None:
+            return app.callback(*args, running=inline_running, **kwargs)(func)
+
+        @functools.wraps(func)
+        def run_inline(*values):
+            return func(lambda value: None, *values)
+        return app.callback(*args, running=inline_running, **kwargs)(run_inline)
+    return decorator
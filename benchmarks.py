@@ -0,0 +1,642 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for the Marketing Analytics Dashboard
+
+Run from the directory that holds the CSV files:
+    python benchmarks.py            # run every benchmark
+    python benchmarks.py predict    # run a single benchmark
+"""
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+
+def _report(name, seconds, number):
+    per_call = seconds / number
+    print(f"  {name:<28} {per_call * 1e6:>12,.1f} us/call  ({number:,} calls)")
+    return per_call
+
+
+# ============================================================================
+# LIVE PREDICTION
+# ============================================================================
+
+def _legacy_predict(clustering_results, retail_data, income, spending, recency):
+    # Per-call pandas work done by predict_customer before PredictionModel
+    cluster_centers = clustering_results.groupby('cluster').agg({
+        'Income': 'mean', 'MntWines': 'mean', 'MntMeatProducts': 'mean', 'Recency': 'mean'
+    }).reset_index()
+    income_max = clustering_results['Income'].max() or 1
+    spending_max = (clustering_results['MntWines'] + clustering_results['MntMeatProducts']).max() or 1
+    recency_max = clustering_results['Recency'].max() or 1
+
+    min_dist = float('inf')
+    predicted_cluster = 0
+    for _, center in cluster_centers.iterrows():
+        center_spending = center['MntWines'] + center['MntMeatProducts']
+        dist = (
+            ((income - center['Income']) / income_max) ** 2 +
+            ((spending - center_spending) / spending_max) ** 2 +
+            ((recency - center['Recency']) / recency_max) ** 2
+        ) ** 0.5
+        if dist < min_dist:
+            min_dist = dist
+            predicted_cluster = int(center['cluster'])
+
+    retail_with_cluster = retail_data.merge(clustering_results[['ID', 'cluster']], on='ID', how='left')
+    retail_with_cluster = retail_with_cluster.dropna(subset=['cluster'])
+    cluster_response_rates = retail_with_cluster.groupby('cluster')['Response'].mean()
+    if predicted_cluster in cluster_response_rates.index:
+        base_probability = cluster_response_rates[predicted_cluster]
+    else:
+        base_probability = retail_data['Response'].mean()
+    if pd.isna(base_probability):
+        base_probability = retail_data['Response'].mean()
+
+    cluster_subset = cluster_centers[cluster_centers['cluster'] == predicted_cluster]
+    cluster_avg_income = cluster_subset['Income'].values[0]
+    cluster_avg_recency = cluster_subset['Recency'].values[0]
+    income_factor = 1.0 + 0.2 * ((income - cluster_avg_income) / cluster_avg_income) if cluster_avg_income > 0 else 1.0
+    recency_factor = 1.0 + 0.1 * ((cluster_avg_recency - recency) / cluster_avg_recency) if cluster_avg_recency > 0 else 1.0
+    probability = max(0.05, min(0.95, base_probability * income_factor * recency_factor))
+    return predicted_cluster, probability
+
+
+def bench_predict(app):
+    print("predict_customer segment/probability lookup")
+    args = (50000, 500, 30)
+    clustering_results, retail_data = app.data.get('clustering_results'), app.data.get('retail_data')
+    model = app.data.get('prediction_model')
+    legacy_cluster, legacy_probability = _legacy_predict(clustering_results, retail_data, *args)
+    cluster, probability = model.predict(*args)
+    assert legacy_cluster == cluster and abs(legacy_probability - probability) < 1e-12
+
+    number = 200
+    legacy = timeit.timeit(lambda: _legacy_predict(clustering_results, retail_data, *args), number=number)
+    before = _report("before (per-call pandas)", legacy, number)
+
+    number = 20000
+    lookup = timeit.timeit(lambda: model.predict(*args), number=number)
+    after = _report("after (PredictionModel)", lookup, number)
+    print(f"  speedup: {before / after:,.0f}x")
+
+
+def bench_score_batch(app):
+    print("batch scoring (score_batch vs. per-customer predict)")
+    rng = np.random.default_rng(0)
+    n = 100_000
+    age = rng.integers(18, 80, n)
+    income = rng.uniform(0, 150000, n)
+    spending = rng.uniform(0, 3000, n)
+    recency = rng.integers(0, 100, n)
+
+    model = app.data.get('prediction_model')
+    sample = 2000
+    loop = timeit.timeit(lambda: [model.predict(income[i], spending[i], recency[i]) for i in range(sample)], number=1)
+    before = _report("before (predict loop)", loop / sample * n, n)
+
+    batch = timeit.timeit(lambda: model.score_batch(age, income, spending, recency), number=3) / 3
+    after = _report("after (score_batch)", batch, n)
+    print(f"  {n:,} customers in {batch * 1e3:,.1f} ms, speedup: {before / after:,.0f}x")
+
+
+# ============================================================================
+# STARTUP DATA LOADING
+# ============================================================================
+
+def bench_startup(app):
+    import data_loader
+    print("startup data loading (CSV parse + preprocess vs. snapshot)")
+    number = 5
+    parse = timeit.timeit(lambda: data_loader.load_data(use_snapshot=False), number=number)
+    before = _report("before (CSV + preprocess)", parse, number)
+
+    data_loader.load_data()  # make sure the snapshot exists
+    snapshot = timeit.timeit(lambda: data_loader.load_data(), number=number)
+    after = _report(f"after ({data_loader.SNAPSHOT_FORMAT} snapshot)", snapshot, number)
+    print(f"  speedup: {before / after:,.1f}x")
+
+
+# ============================================================================
+# OVERVIEW CHARTS
+# ============================================================================
+
+def _legacy_page1_figures(combined_data, age_filter, education_filter, campaign_filter, marital_filter):
+    # Pandas filtering + px.histogram over raw rows, as update_page1_charts did before BitmapIndex
+    import plotly.express as px
+    import plotly.graph_objects as go
+    filtered = combined_data.copy()
+    for col, value in [('Age_Group', age_filter), ('Education', education_filter),
+                       ('Campaign_Type', campaign_filter), ('Marital_Status', marital_filter)]:
+        if value != 'All':
+            filtered = filtered[filtered[col] == value]
+    fig_age = px.histogram(filtered, x='Age', nbins=20, color='Campaign_Type',
+                           color_discrete_map={'Bank': '#6366f1', 'Retail': '#ec4899'})
+    response_counts = filtered.groupby(['Campaign_Type', 'Response'], observed=True).size().reset_index(name='Count')
+    fig_response = go.Figure()
+    for resp in (0, 1):
+        counts = response_counts[response_counts['Response'] == resp]
+        fig_response.add_trace(go.Bar(x=counts['Campaign_Type'], y=counts['Count']))
+    return fig_age, fig_response
+
+
+def bench_page1_histogram(app):
+    print("Overview charts: callback latency and histogram payload (uncached)")
+    combined_data = app.data.get('combined_data')
+    index = app.data.get('overview_index')
+    cases = [('All', 'All', 'All', 'All'), ('30-39', 'All', 'All', 'All'), ('All', 'All', 'Retail', 'All')]
+    number = 10
+    for filters in cases:
+        print(f"  filters={filters}")
+        legacy = timeit.timeit(lambda: [f.to_json() for f in _legacy_page1_figures(combined_data, *filters)], number=number)
+        before = _report("before (px.histogram)", legacy, number)
+        indexed = timeit.timeit(lambda: [f.to_json() for f in app.build_page1_figures(index, *filters)], number=number)
+        after = _report("after (bitmap + bincount)", indexed, number)
+        legacy_bytes = len(_legacy_page1_figures(combined_data, *filters)[0].to_json())
+        indexed_bytes = len(app.build_page1_figures(index, *filters)[0].to_json())
+        print(f"  histogram payload: {legacy_bytes:,} -> {indexed_bytes:,} bytes, latency speedup {before / after:,.1f}x")
+
+
+# ============================================================================
+# CLUSTER / ANOMALY SCATTERS
+# ============================================================================
+
+def bench_cluster_scatter(app):
+    import plotly.express as px
+    print("PCA scatter at 1M synthetic customers (px.scatter SVG vs. reduced WebGL)")
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    points = pd.DataFrame({
+        'pca1': rng.normal(size=n), 'pca2': rng.normal(size=n), 'cluster': rng.integers(0, 4, n),
+        'Income': rng.uniform(0, 150000, n), 'MntWines': rng.uniform(0, 1500, n), 'Recency': rng.integers(0, 100, n),
+    })
+
+    def legacy():
+        plot_data = points.copy()
+        plot_data['cluster_str'] = plot_data['cluster'].astype(str)
+        fig = px.scatter(plot_data, x='pca1', y='pca2', color='cluster_str', hover_data=['Income', 'MntWines', 'Recency'])
+        fig.update_traces(marker=dict(size=10, opacity=0.8, line=dict(width=1, color='white')))
+        return fig.to_json()
+
+    legacy_json = legacy()
+    before = _report("before (px.scatter, all rows)", timeit.timeit(legacy, number=1), 1)
+    reduced_json = app.build_cluster_scatter(points, [0, 1, 2, 3], height=350).to_json()
+    after = _report(f"after ({app.SCATTER_REDUCTION})",
+                    timeit.timeit(lambda: app.build_cluster_scatter(points, [0, 1, 2, 3], height=350).to_json(), number=3), 3)
+    print(f"  payload: {len(legacy_json):,} -> {len(reduced_json):,} bytes, speedup {before / after:,.1f}x")
+
+
+def bench_cluster_filter(app):
+    from filter_index import RangeGridIndex
+    print("Segments page slider filter at 1M synthetic customers")
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    points = pd.DataFrame({
+        'cluster': rng.integers(0, 4, n), 'Income': rng.uniform(0, 150000, n), 'Recency': rng.integers(0, 100, n),
+    })
+    index = RangeGridIndex(points, 'cluster', app.CLUSTER_RANGE_STEPS)
+    ranges = {'Income': [20000, 80000], 'Recency': [10, 60]}
+
+    def legacy():
+        filtered = points.copy()
+        filtered = filtered[filtered['cluster'] == 2]
+        filtered = filtered[(filtered['Income'] >= 20000) & (filtered['Income'] <= 80000)]
+        return filtered[(filtered['Recency'] >= 10) & (filtered['Recency'] <= 60)]
+
+    assert np.array_equal(legacy().index.to_numpy(), index.select(2, ranges))
+    number = 20
+    before = _report("before (copy + comparisons)", timeit.timeit(legacy, number=number), number)
+    after = _report("after (RangeGridIndex)", timeit.timeit(lambda: index.select(2, ranges), number=number), number)
+    print(f"  speedup: {before / after:,.1f}x")
+
+
+# ============================================================================
+# ASSOCIATION RULES
+# ============================================================================
+
+def bench_rule_query(app):
+    from rule_store import RuleStore
+    print("'rules with antecedent X and lift >= t' (cleaned-frame scan vs. RuleStore postings)")
+    raw = app.data.get('association_rules')
+    item, threshold = 'Response_1', 1.5
+    for scale in (1, 100):
+        rules = pd.concat([raw] * scale, ignore_index=True)
+        cleaned = rules.copy()
+        for col in ('antecedents', 'consequents'):
+            cleaned[col] = cleaned[col].astype(str).str.replace(r"frozenset\(\{|\}\)", '', regex=True).str.replace("'", "")
+        store = RuleStore(rules)
+
+        def legacy():
+            holds = cleaned['antecedents'].str.split(', ').apply(lambda items: item in items)
+            return cleaned[holds & (cleaned['lift'] >= threshold)].nlargest(10, 'lift')
+
+        print(f"  {len(rules):,} rules")
+        number = 5
+        before = _report("before (string scan)", timeit.timeit(legacy, number=number), number)
+        number = 2000
+        query = lambda: store.query(antecedent=item, min_lift=threshold, limit=10)
+        after = _report("after (RuleStore.query)", timeit.timeit(query, number=number), number)
+        print(f"  speedup: {before / after:,.0f}x")
+
+        # Rule explorer: page 5 by confidence with a support floor, then one item filter
+        explore = lambda: store.frame(store.query(min_support=0.05, sort_by='confidence', offset=40, limit=10)[0])
+        _report("explorer page (all items)", timeit.timeit(explore, number=200), 200)
+        explore = lambda: store.frame(store.query(consequent=item, min_confidence=0.3, offset=40, limit=10)[0])
+        _report("explorer page (consequent)", timeit.timeit(explore, number=200), 200)
+
+
+def bench_mining(app):
+    import os
+    import mining
+    print("association rule mining (bitset Apriori, min_support=0.05) at 1x/10x/100x customers")
+    retail_data = app.data.get('retail_data')
+    rng = np.random.default_rng(0)
+    processes = min(4, os.cpu_count() or 1)
+    for scale in (1, 10, 100):
+        # Scale-ups resample customers with replacement, keeping the joint distribution
+        sample = retail_data if scale == 1 else retail_data.iloc[rng.integers(0, len(retail_data), len(retail_data) * scale)]
+        print(f"  {len(sample):,} customers")
+        serial = timeit.timeit(lambda: mining.mine_rules(sample), number=1)
+        _report("1 process", serial, 1)
+        if processes > 1:
+            parallel = timeit.timeit(lambda: mining.mine_rules(sample, processes=processes), number=1)
+            _report(f"{processes} processes", parallel, 1)
+        print(f"  {len(mining.mine_rules(sample)):,} rules")
+
+
+# ============================================================================
+# CSV LOADING MEMORY
+# ============================================================================
+
+# Each load runs in its own interpreter and reports its peak RSS as VmHWM, which
+# exec resets. ru_maxrss would not do: a forked child inherits the parent's
+# high-water mark, so every load would report at least this process's peak.
+_LOAD_SCRIPT = """
+import sys
+import pandas as pd
+import data_loader
+
+def peak_mb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+
+name, mode = sys.argv[1], sys.argv[2]
+baseline = peak_mb()
+path, kwargs = data_loader.SOURCES[name]
+if mode == 'legacy':
+    df = pd.read_csv(path, **kwargs)
+    df = data_loader.preprocess_bank(df) if name == 'bank_data' else data_loader.preprocess_retail(df)
+else:
+    df = data_loader.DATASETS[name][1](None)
+print(len(df), df.memory_usage(deep=True).sum() / 2**20, peak_mb(), peak_mb() - baseline)
+"""
+
+
+def _load_peak(name, mode, directory):
+    import os
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+               DASHBOARD_INGEST_DIR=os.path.join(directory, 'no-ingest'))
+    proc = subprocess.run([sys.executable, '-c', _LOAD_SCRIPT, name, mode], cwd=directory, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        reason = 'killed (out of memory?)' if proc.returncode < 0 else proc.stderr.strip().splitlines()[-1]
+        print(f"  {name:<12} {mode:<9} failed: {reason}")
+        return
+    rows, frame_mb, peak_mb, load_mb = proc.stdout.split()
+    print(f"  {name:<12} {mode:<9} {int(rows):>12,} rows  frame {float(frame_mb):>9,.1f} MB  "
+          f"peak RSS {float(peak_mb):>9,.1f} MB (+{float(load_mb):,.1f} MB over imports)")
+
+
+def _write_synthetic(name, directory, n_rows):
+    # Resample the real rows with replacement, in blocks, straight to disk
+    import os
+    import data_loader
+    path, kwargs = data_loader.SOURCES[name]
+    source = pd.read_csv(path, **kwargs)
+    rng = np.random.default_rng(0)
+    block = 1_000_000
+    target = os.path.join(directory, path)
+    for start in range(0, n_rows, block):
+        rows = source.iloc[rng.integers(0, len(source), min(block, n_rows - start))]
+        rows.to_csv(target, mode='w' if start == 0 else 'a', header=start == 0, index=False,
+                    sep=kwargs.get('sep', ','))
+
+
+def bench_csv_memory(app):
+    import os
+    import tempfile
+    import data_loader
+    n_rows = int(os.environ.get('DASHBOARD_BENCH_ROWS', '10000000'))
+    print("peak RSS loading bank/retail: full read_csv + preprocess vs chunked read with dtypes/usecols")
+    print("  current files")
+    for name in ('bank_data', 'retail_data'):
+        for mode in ('legacy', 'streaming'):
+            _load_peak(name, mode, os.getcwd())
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"  synthetic {n_rows:,}-row files")
+        for name in ('bank_data', 'retail_data'):
+            _write_synthetic(name, directory, n_rows)
+            for mode in ('legacy', 'streaming'):
+                _load_peak(name, mode, directory)
+            os.remove(os.path.join(directory, data_loader.SOURCES[name][0]))
+
+
+# ============================================================================
+# PREPROCESSING
+# ============================================================================
+
+def _legacy_age_group(age):
+    if age < 30: return '18-29'
+    elif age < 40: return '30-39'
+    elif age < 50: return '40-49'
+    elif age < 60: return '50-59'
+    else: return '60+'
+
+
+def _legacy_preprocess(bank_data, retail_data):
+    # Per-row apply and chained Series additions, as preprocessing did before vectorizing
+    from datetime import datetime
+    bank_data['Response'] = (bank_data['y'] == 'yes').astype(int)
+    bank_data['Campaign_Type'] = 'Bank'
+    bank_data['Age_Group'] = bank_data['age'].apply(_legacy_age_group)
+    retail_data['Age'] = datetime.now().year - retail_data['Year_Birth']
+    retail_data['Total_Spending'] = (retail_data['MntWines'] + retail_data['MntFruits'] +
+                                      retail_data['MntMeatProducts'] + retail_data['MntFishProducts'] +
+                                      retail_data['MntSweetProducts'] + retail_data['MntGoldProds'])
+    retail_data['Total_Accepted'] = (retail_data['AcceptedCmp1'] + retail_data['AcceptedCmp2'] +
+                                      retail_data['AcceptedCmp3'] + retail_data['AcceptedCmp4'] +
+                                      retail_data['AcceptedCmp5'] + retail_data['Response'])
+    retail_data['Campaign_Type'] = 'Retail'
+    retail_data['Age_Group'] = retail_data['Age'].apply(_legacy_age_group)
+    return bank_data, retail_data
+
+
+def _vectorized_preprocess(bank_data, retail_data):
+    import data_loader
+    return data_loader.preprocess_bank(bank_data), data_loader.derive_retail(retail_data)
+
+
+def _time_on_copies(func, bank, retail, number):
+    # Preprocessing assigns into its inputs, so each call gets fresh copies made outside the timer
+    total = 0.0
+    for _ in range(number):
+        b, r = bank.copy(), retail.copy()
+        total += timeit.timeit(lambda: func(b, r), number=1)
+    return total
+
+
+def bench_preprocess(app):
+    import data_loader
+    print("bank + retail derived columns (apply + chained sums vs. age-group table + in-place row sums)")
+    sources = {}
+    for name in ('bank_data', 'retail_data'):
+        path, kwargs = data_loader.SOURCES[name]
+        schema = data_loader.SOURCE_SCHEMAS[name]
+        sources[name] = pd.read_csv(path, usecols=list(schema), dtype=schema, **kwargs)
+    rng = np.random.default_rng(0)
+    for n in (100_000, 1_000_000):
+        # Synthetic inputs resample the parsed source rows
+        bank, retail = (sources[k].iloc[rng.integers(0, len(sources[k]), n)].reset_index(drop=True)
+                        for k in ('bank_data', 'retail_data'))
+        print(f"  {n:,} rows per source")
+        legacy_out = _legacy_preprocess(bank.copy(), retail.copy())
+        new_out = _vectorized_preprocess(bank.copy(), retail.copy())
+        for old, new in zip(legacy_out, new_out):
+            assert (old['Age_Group'] == new['Age_Group'].astype(str)).all()
+        assert (legacy_out[1]['Total_Spending'] == new_out[1]['Total_Spending']).all()
+        assert (legacy_out[1]['Total_Accepted'] == new_out[1]['Total_Accepted']).all()
+
+        number = 3
+        legacy = _time_on_copies(_legacy_preprocess, bank, retail, number)
+        before = _report("before (apply + chained +)", legacy, number)
+        vectorized = _time_on_copies(_vectorized_preprocess, bank, retail, number)
+        after = _report("after (vectorized)", vectorized, number)
+        print(f"  {after / n * 1e9:,.1f} ns/row, speedup: {before / after:,.1f}x")
+
+
+# ============================================================================
+# SEGMENTATION
+# ============================================================================
+
+def bench_clustering(app):
+    import os
+    from clustering import CHUNK_ROWS, FEATURES, fit_clusters
+    print("mini-batch K-Means segmentation (fit + assign every customer)")
+    retail = app.data.get('retail_data')[['ID'] + FEATURES].reset_index(drop=True)
+    rng = np.random.default_rng(0)
+
+    def resampled(n):
+        return retail.iloc[rng.integers(0, len(retail), n)].reset_index(drop=True)
+
+    for n in (len(retail), 1_000_000):
+        frame = retail if n == len(retail) else resampled(n)
+        start = timeit.default_timer()
+        model = fit_clusters(frame, k=4)
+        fit = timeit.default_timer() - start
+        start = timeit.default_timer()
+        out = model.transform(frame)
+        transform = timeit.default_timer() - start
+        print(f"  {n:>12,} rows in memory   fit {fit:6.2f} s  assign {transform:6.2f} s  "
+              f"sizes {np.bincount(out['cluster'], minlength=model.k).tolist()}")
+
+    # Chunked input never holds more than one chunk of customers
+    n = int(os.environ.get('DASHBOARD_BENCH_ROWS', 10_000_000))
+    chunk = resampled(CHUNK_ROWS)
+    frames = lambda: (chunk.iloc[:min(CHUNK_ROWS, n - i)] for i in range(0, n, CHUNK_ROWS))
+    start = timeit.default_timer()
+    model = fit_clusters(frames, k=4)
+    fit = timeit.default_timer() - start
+    start = timeit.default_timer()
+    rows = sum(len(out) for out in model.iter_transform(frames))
+    transform = timeit.default_timer() - start
+    print(f"  {rows:>12,} rows chunked     fit {fit:6.2f} s  assign {transform:6.2f} s")
+
+
+# ============================================================================
+# ANOMALY SCORING
+# ============================================================================
+
+def _walk_trees(forest, row):
+    # One row, one tree at a time: the per-node loop the flat arrays replace
+    total = 0.0
+    for root in forest.roots:
+        node = root
+        while forest.threshold[node] != np.inf:
+            node = forest.left[node] + (row[forest.feature[node]] >= forest.threshold[node])
+        total += forest.path[node]
+    return total / forest.n_trees
+
+
+def bench_anomaly(app):
+    from anomaly import fit_detector
+    print("Isolation Forest (per-row tree walk vs. vectorized batch, sketch vs. exact threshold)")
+    retail = app.data.get('retail_data')
+    start = timeit.default_timer()
+    detector = fit_detector(retail)
+    print(f"  fit {detector.forest.n_trees} trees on {len(retail):,} rows: {timeit.default_timer() - start:.2f} s")
+    forest = detector.forest
+
+    values = detector.features(retail.iloc[:200])
+    assert np.allclose([_walk_trees(forest, row) for row in values], forest.path_lengths(values))
+    number = 200
+    before = _report("before (per-row walk)", timeit.timeit(lambda: _walk_trees(forest, values[0]), number=number), number)
+    rng = np.random.default_rng(0)
+    batch = detector.features(retail.iloc[rng.integers(0, len(retail), 100_000)])
+    number = 3
+    after = _report("after (100k-row batch)", timeit.timeit(lambda: forest.score(batch), number=number), number) / len(batch)
+    print(f"  {after * 1e6:,.2f} us/row, speedup: {before / after:,.1f}x")
+
+    scores = detector.score(retail)
+    exact = np.quantile(scores, 1 - detector.contamination)
+    print(f"  threshold: sketch {detector.threshold:.5f} vs exact {exact:.5f}, "
+          f"flagged {np.mean(scores > detector.threshold):.2%}")
+    ingest = retail.iloc[:1000]
+    number = 20
+    _report("update threshold (1k rows)", timeit.timeit(lambda: detector.updated(ingest), number=number), number)
+    _report("rescore history", timeit.timeit(lambda: detector.score(retail), number=number), number)
+
+
+# ============================================================================
+# SIMILAR CUSTOMERS
+# ============================================================================
+
+def bench_similar_customers(app):
+    import os
+    from neighbors import KDTree, brute_force_query
+    print("10 nearest customers in normalized income/spending/recency (brute force vs. KD-tree)")
+    similar = app.data.get('similar_customers')
+    base = similar.customers[['Income', 'Spending', 'Recency']].to_numpy() / similar.scale
+    rng = np.random.default_rng(0)
+    queries = base[rng.integers(0, len(base), 100)] + rng.normal(0, 0.01, (100, 3))
+    for n in (len(base), 1_000_000, int(os.environ.get('DASHBOARD_BENCH_ROWS', 10_000_000))):
+        # Larger populations jitter resampled customers so points are distinct
+        points = base if n == len(base) else base[rng.integers(0, len(base), n)] + rng.normal(0, 0.005, (n, 3))
+        start = timeit.default_timer()
+        tree = KDTree(points)
+        print(f"  {n:,} customers, build {timeit.default_timer() - start:.2f} s")
+        for q in queries[:20]:
+            assert np.allclose(tree.query(q)[1], brute_force_query(points, q)[1])
+        number = 5 if n > 1_000_000 else 20
+        it = iter(queries)
+        before = _report("before (brute force)", timeit.timeit(lambda: brute_force_query(points, next(it)), number=number), number)
+        number = len(queries)
+        it = iter(queries)
+        after = _report("after (KD-tree)", timeit.timeit(lambda: tree.query(next(it)), number=number), number)
+        print(f"  speedup: {before / after:,.1f}x")
+        del points, tree
+
+
+# ============================================================================
+# COHORT CUBE
+# ============================================================================
+
+def _legacy_population(bank_data, retail_data, clustering_results):
+    # Full-column scans behind the Overview KPIs and the prediction population comparison
+    total = len(bank_data) + len(retail_data)
+    kpis = (total, retail_data['Income'].mean(),
+            (bank_data['Response'].sum() + retail_data['Response'].sum()) / total,
+            retail_data['Total_Spending'].mean())
+    population = (retail_data['Response'].mean(), retail_data['Income'].mean(),
+                  retail_data['Total_Spending'].mean(), retail_data['Recency'].mean())
+    rates = retail_data[['ID', 'Response']].merge(clustering_results[['ID', 'cluster']], on='ID', how='inner') \
+        .groupby('cluster')['Response'].mean()
+    return kpis, population, rates
+
+
+def _cube_population(cube):
+    kpis = (cube.size(), cube.mean('Income'), cube.mean('Response'), cube.mean('Total_Spending'))
+    population = tuple(cube.mean(m, Campaign_Type='Retail') for m in ('Response', 'Income', 'Total_Spending', 'Recency'))
+    rates = cube.stats('cluster', Campaign_Type='Retail')['Response_mean'].drop(-1, errors='ignore')
+    return kpis, population, rates
+
+
+def bench_cohort_cube(app):
+    from aggregates import CohortCube
+    print("Overview KPIs + prediction population/cluster response rates (column scans vs. cube rollups)")
+    bank, retail, clusters = (app.data.get(n) for n in ('bank_data', 'retail_data', 'clustering_results'))
+    rng = np.random.default_rng(0)
+    for scale in (1, 100):
+        if scale > 1:
+            # Resampled customers get fresh IDs, with clusters to match
+            pick = rng.integers(0, len(retail), len(retail) * scale)
+            retail = retail.iloc[pick].reset_index(drop=True).assign(ID=np.arange(len(pick)))
+            clusters = pd.DataFrame({'ID': retail['ID'], 'cluster': app.with_clusters(
+                app.data.get('retail_data')).iloc[pick]['cluster'].to_numpy()})
+            bank = bank.iloc[rng.integers(0, len(bank), len(bank) * scale)].reset_index(drop=True)
+        membership = pd.Series(clusters['cluster'].to_numpy(), index=clusters['ID'].to_numpy())
+        clustered = retail.assign(cluster=membership.reindex(retail['ID'].to_numpy()).fillna(-1).astype(int).to_numpy())
+        start = timeit.default_timer()
+        cube = CohortCube.from_frame(bank, app.COHORT_DIMENSIONS, app.COHORT_MEASURES).updated(clustered)
+        build = timeit.default_timer() - start
+        print(f"  {len(bank) + len(retail):,} customers, {len(cube.cells)} cells, build {build:.2f} s")
+
+        legacy, rolled = _legacy_population(bank, retail, clusters), _cube_population(cube)
+        assert np.allclose(legacy[0], rolled[0]) and np.allclose(legacy[1], rolled[1])
+        assert np.allclose(legacy[2].to_numpy(), rolled[2].reindex(legacy[2].index).to_numpy())
+        number = 5 if scale > 1 else 50
+        before = _report("before (column scans)", timeit.timeit(lambda: _legacy_population(bank, retail, clusters), number=number), number)
+        number = 200
+        after = _report("after (cube rollups)", timeit.timeit(lambda: _cube_population(cube), number=number), number)
+        print(f"  speedup: {before / after:,.1f}x")
+        batch = clustered.iloc[:1000]
+        _report("ingest 1k retail rows", timeit.timeit(lambda: cube.updated(batch), number=20), 20)
+
+
+# ============================================================================
+# INSTRUMENTATION OVERHEAD
+# ============================================================================
+
+def bench_metrics(app):
+    from metrics import Metrics
+    print("instrumentation cost per callback (disabled vs. enabled)")
+    number = 100_000
+    for enabled in (False, True):
+        metrics = Metrics(enabled=enabled)
+        labels = {'callback': 'update_cluster_chart', 'page': '/page-3'}
+
+        def callback():
+            with metrics.timer('page_layout', page='/page-3'):
+                metrics.add_rows(1000)
+            if enabled:
+                # What the after_request hook records for each callback request
+                for family, value in (('callback_wall_seconds', 0.012), ('callback_cpu_seconds', 0.01),
+                                      ('callback_rows', 1000), ('callback_response_bytes', 80_000)):
+                    metrics.observe(family, labels, value)
+
+        elapsed = timeit.timeit(callback, number=number)
+        _report("enabled" if enabled else "disabled", elapsed, number)
+    number = 100
+    render = timeit.timeit(metrics.render, number=number)
+    _report("render /metrics", render, number)
+
+
+BENCHMARKS = {
+    'predict': bench_predict,
+    'score_batch': bench_score_batch,
+    'startup': bench_startup,
+    'page1_histogram': bench_page1_histogram,
+    'cluster_scatter': bench_cluster_scatter,
+    'cluster_filter': bench_cluster_filter,
+    'rule_query': bench_rule_query,
+    'mining': bench_mining,
+    'csv_memory': bench_csv_memory,
+    'preprocess': bench_preprocess,
+    'metrics': bench_metrics,
+    'clustering': bench_clustering,
+    'anomaly': bench_anomaly,
+    'similar_customers': bench_similar_customers,
+    'cohort_cube': bench_cohort_cube,
+}
+
+
+if __name__ == '__main__':
+    import app
+
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name](app)
+        print()
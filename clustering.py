@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Customer segmentation for the Segments page
+
+Recomputes clustering_results.csv from the retail customer table: the
+Income/Recency/MntWines/MntMeatProducts/Kidhome features are standardized,
+projected onto their first two principal components (pca1/pca2) and
+clustered with mini-batch K-Means.
+
+Input is a DataFrame or a zero-argument callable returning a fresh iterator
+of chunks (e.g. ``lambda: pd.read_csv(path, chunksize=...)``), so 10M
+customers never have to be in memory at once. Fitting makes one pass for
+the feature moments, which give the scaler and, with only five features,
+the exact PCA from their 5x5 correlation matrix, then streams mini-batches
+until ``max_steps`` center updates.
+
+    python clustering.py                      # rewrite clustering_results.csv
+    python clustering.py --k 5 --output clusters.csv
+    python clustering.py --input big.csv --sep ';' --chunk-rows 500000
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ['Income', 'Recency', 'MntWines', 'MntMeatProducts', 'Kidhome']
+OUTPUT_COLUMNS = ['ID', 'pca1', 'pca2', 'cluster'] + FEATURES
+
+CHUNK_ROWS = 500_000
+# Customers sampled (uniformly, across all chunks) to seed the centers with k-means++
+INIT_SIZE = 10_000
+# Mini-batch steps between progress reports
+PROGRESS_STEPS = 25
+
+
+def iter_chunks(frames, chunk_rows=CHUNK_ROWS):
+    if isinstance(frames, pd.DataFrame):
+        return (frames.iloc[i:i + chunk_rows] for i in range(0, len(frames), chunk_rows))
+    return iter(frames())
+
+
+def feature_matrix(chunk, features=FEATURES):
+    return chunk[features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+
+# ============================================================================
+# MODEL
+# ============================================================================
+
+class ClusterModel:
+
+    def __init__(self, mean, std, components, centers):
+        self.mean = mean
+        self.std = std
+        self.components = components  # (2, n_features) principal axes of the standardized features
+        self.std_centers = centers    # (k, n_features) in standardized units
+
+    @property
+    def k(self):
+        return len(self.std_centers)
+
+    @property
+    def centers(self):
+        """Cluster centers in original feature units, indexed by cluster."""
+        return pd.DataFrame(self.std_centers * self.std + self.mean, columns=FEATURES,
+                            index=pd.RangeIndex(self.k, name='cluster'))
+
+    def standardize(self, values):
+        # Missing values (unparsed incomes) are imputed with the mean, i.e. 0 once standardized
+        z = (values - self.mean) / self.std
+        return np.nan_to_num(z, nan=0.0)
+
+    def assign(self, z):
+        return nearest_center(z, self.std_centers)
+
+    def transform(self, frames, chunk_rows=CHUNK_ROWS):
+        """The clustering_results schema for every customer (chunks are concatenated)."""
+        return pd.concat(list(self.iter_transform(frames, chunk_rows)), ignore_index=True)
+
+    def iter_transform(self, frames, chunk_rows=CHUNK_ROWS):
+        for chunk in iter_chunks(frames, chunk_rows):
+            values = feature_matrix(chunk)
+            z = self.standardize(values)
+            pca = z @ self.components.T
+            out = pd.DataFrame({'ID': chunk['ID'].to_numpy(), 'pca1': pca[:, 0], 'pca2': pca[:, 1],
+                                'cluster': self.assign(z)})
+            for i, col in enumerate(FEATURES):
+                out[col] = np.where(np.isnan(values[:, i]), self.mean[i], values[:, i])
+            yield out
+
+
+def nearest_center(z, centers):
+    # |z - c|^2 = |z|^2 - 2 z.c + |c|^2; |z|^2 is the same for every center
+    scores = (centers ** 2).sum(axis=1) - 2 * (z @ centers.T)
+    return scores.argmin(axis=1).astype(np.int32)
+
+
+# ============================================================================
+# FITTING
+# ============================================================================
+
+def feature_moments(frames, chunk_rows, rng, features=FEATURES):
+    """Row count, per-feature mean/std, the correlation matrix and a uniform sample of rows, in one pass."""
+    # Chunk moments merged with Chan's parallel update; missing values count as their chunk's mean
+    n, mean, scatter = 0, 0.0, 0.0
+    sample, sample_keys = None, None
+    for chunk in iter_chunks(frames, chunk_rows):
+        values = feature_matrix(chunk, features)
+        if not len(values):
+            continue
+        with np.errstate(invalid='ignore'):
+            chunk_mean = np.nan_to_num(np.nanmean(values, axis=0)) if np.isnan(values).any() else values.mean(axis=0)
+        deviations = np.where(np.isnan(values), 0.0, values - chunk_mean)
+        delta = chunk_mean - mean
+        total = n + len(values)
+        mean = mean + delta * len(values) / total
+        scatter = scatter + deviations.T @ deviations + np.outer(delta, delta) * n * len(values) / total
+        n = total
+
+        # Uniform sample: keep the rows with the smallest random keys seen so far
+        keys = rng.random(len(values))
+        if sample is not None:
+            values, keys = np.vstack([sample, values]), np.concatenate([sample_keys, keys])
+        if len(keys) > INIT_SIZE:
+            keep = np.argpartition(keys, INIT_SIZE)[:INIT_SIZE]
+            values, keys = values[keep], keys[keep]
+        sample, sample_keys = values, keys
+    if sample is None:
+        raise ValueError("No customers to cluster")
+
+    covariance = scatter / max(n - 1, 1)
+    std = np.sqrt(np.diag(covariance))
+    std[std == 0] = 1.0
+    return n, mean, std, covariance / np.outer(std, std), sample
+
+
+def principal_axes(correlation, n_components=2):
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    axes = eigenvectors[:, np.argsort(eigenvalues)[::-1][:n_components]].T
+    # Fix each axis' sign so the largest loading is positive (stable across refits)
+    signs = np.sign(axes[np.arange(len(axes)), np.abs(axes).argmax(axis=1)])
+    return axes * signs[:, None]
+
+
+def kmeans_plus_plus(z, k, rng):
+    centers = [z[rng.integers(len(z))]]
+    distance = ((z - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distance.sum()
+        i = rng.choice(len(z), p=distance / total) if total > 0 else rng.integers(len(z))
+        centers.append(z[i])
+        distance = np.minimum(distance, ((z - z[i]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def fit_clusters(frames, k=4, batch_size=1024, max_steps=500, chunk_rows=CHUNK_ROWS, seed=0, init=None,
+                 progress=None):
+    """Fit the scaler, PCA axes and ``k`` mini-batch K-Means centers.
+
+    ``init`` (centers in feature units, e.g. a previous model's ``centers``)
+    skips k-means++, so a refit after an ingest starts from where the last one
+    ended and keeps its cluster numbering. ``progress(steps, max_steps)`` is
+    called every PROGRESS_STEPS center updates and when fitting ends.
+    """
+    rng = np.random.default_rng(seed)
+    _, mean, std, correlation, sample = feature_moments(frames, chunk_rows, rng)
+    model = ClusterModel(mean, std, principal_axes(correlation), None)
+    sample_z = model.standardize(sample)
+    if init is not None:
+        centers = model.standardize(np.asarray(init, dtype=float))
+    else:
+        centers = kmeans_plus_plus(sample_z, k, rng)
+    counts = np.zeros(len(centers))
+
+    # An in-memory frame is standardized once; chunked input is re-read every epoch
+    if isinstance(frames, pd.DataFrame):
+        standardized = [model.standardize(feature_matrix(c)) for c in iter_chunks(frames, chunk_rows)]
+        epoch = lambda: iter(standardized)
+    else:
+        epoch = lambda: (model.standardize(feature_matrix(c)) for c in iter_chunks(frames, chunk_rows))
+
+    # Mini-batch K-Means: each center moves towards the mean of its batch
+    # members with a step of (members / everything it has absorbed so far)
+    steps = 0
+    while steps < max_steps:
+        for z in epoch():
+            order = rng.permutation(len(z))
+            for start in range(0, len(z), batch_size):
+                batch = z[order[start:start + batch_size]]
+                labels = nearest_center(batch, centers)
+                members = np.bincount(labels, minlength=len(centers))
+                sums = np.column_stack([np.bincount(labels, weights=batch[:, j], minlength=len(centers))
+                                        for j in range(batch.shape[1])])
+                hit = members > 0
+                counts[hit] += members[hit]
+                centers[hit] += (sums[hit] - members[hit, None] * centers[hit]) / counts[hit, None]
+                steps += 1
+                if progress is not None and (steps % PROGRESS_STEPS == 0 or steps >= max_steps):
+                    progress(steps, max_steps)
+                if steps >= max_steps:
+                    break
+            if steps >= max_steps:
+                break
+
+    # Fresh fits number clusters by center income
+    if init is None:
+        centers = centers[np.argsort(centers[:, FEATURES.index('Income')], kind='stable')]
+    model.std_centers = centers
+    return model
+
+
+def cluster_customers(frames, k=4, **kwargs):
+    model = fit_clusters(frames, k=k, **kwargs)
+    return model, model.transform(frames, kwargs.get('chunk_rows', CHUNK_ROWS))
+
+
+# ============================================================================
+# SEGMENT NAMES
+# ============================================================================
+
+def segment_labels(centers):
+    """Names for clusters from their centers (Income, MntWines, MntMeatProducts, Kidhome).
+
+    The two biggest spenders are 'Premium VIP' and 'High-Spending Elite', the
+    lowest-income cluster with kids at home is 'Low-Income Family' and the
+    highest-income one left is 'Middle-Class Stable'; any others keep 'Cluster <n>'.
+    """
+    spending = (centers['MntWines'] + centers['MntMeatProducts']).sort_values(ascending=False, kind='stable')
+    labels = {c: f'Cluster {c}' for c in centers.index}
+    remaining = list(centers.sort_values('Income', kind='stable').index)
+
+    def name(cluster, label):
+        labels[cluster] = label
+        remaining.remove(cluster)
+
+    name(spending.index[0], 'Premium VIP')
+    if len(centers) > 3:
+        name(spending.index[1], 'High-Spending Elite')
+    family = [c for c in remaining if centers.loc[c, 'Kidhome'] >= 0.5]
+    if family:
+        name(family[0], 'Low-Income Family')
+    if remaining:
+        name(remaining[-1], 'Middle-Class Stable')
+    return labels
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute clustering_results.csv with mini-batch K-Means")
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--input', default=None, help="customer CSV to stream (default: the dashboard's retail_data)")
+    parser.add_argument('--sep', default=',')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--max-steps', type=int, default=500)
+    parser.add_argument('--output', default='clustering_results.csv')
+    args = parser.parse_args()
+
+    if args.input:
+        frames = lambda: pd.read_csv(args.input, sep=args.sep, usecols=['ID'] + FEATURES, chunksize=args.chunk_rows)
+    else:
+        from data_loader import DATASETS
+        frames = DATASETS['retail_data'][1](None)
+
+    model = fit_clusters(frames, k=args.k, batch_size=args.batch_size, max_steps=args.max_steps,
+                         chunk_rows=args.chunk_rows)
+    rows = 0
+    for i, out in enumerate(model.iter_transform(frames, args.chunk_rows)):
+        out[OUTPUT_COLUMNS].to_csv(args.output, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(out)
+    print(f"{rows:,} customers in {model.k} clusters -> {args.output}")
+    print(model.centers.round(1).to_string())
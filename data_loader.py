@@ -0,0 +1,581 @@
+# -*- coding: utf-8 -*-
+"""
+Data loading and preprocessing for the Marketing Analytics Dashboard
+
+Every dataset is parsed and preprocessed once, then written as a binary
+columnar snapshot (Feather when pyarrow is installed, pickle otherwise).
+Each snapshot is keyed by the size/mtime of its source files, so gunicorn
+workers booting against unchanged CSVs load the snapshot instead of
+re-parsing and re-deriving every column.
+
+Datasets are served through a DataRegistry that loads each one on first use
+(or in a background thread), so the server can boot and answer health
+checks before any CSV has been read.
+
+With DASHBOARD_DATA_STORE=mmap the snapshot is instead a directory of .npy
+columns (strings stored as categorical codes) that every worker maps
+read-only, so the OS page cache holds one shared copy of the data instead
+of one private copy per worker.
+
+New rows can be appended without a restart: each batch is written as a CSV
+under INGEST_DIR, read back by every later load and included in the source
+fingerprint, while the running process applies it incrementally.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from mining import mine_rules
+
+DATA_STORE = os.environ.get('DASHBOARD_DATA_STORE', 'memory')
+
+try:
+    import pyarrow  # noqa: F401  (enables the Feather snapshot format)
+    SNAPSHOT_FORMAT = 'feather'
+except ImportError:
+    SNAPSHOT_FORMAT = 'pickle'
+if DATA_STORE == 'mmap':
+    SNAPSHOT_FORMAT = 'npy'
+
+# Bump when the preprocessing functions change so stale snapshots are not reused
+PREPROCESS_VERSION = 6
+
+SNAPSHOT_DIR = os.environ.get('DASHBOARD_SNAPSHOT_DIR', '.data_snapshot')
+
+# Append-only batches of new rows, one CSV per batch under INGEST_DIR/<source>/
+INGEST_DIR = os.environ.get('DASHBOARD_INGEST_DIR', 'ingest')
+INGESTABLE = ('bank_data', 'retail_data', 'clustering_results')
+
+SOURCES = {
+    'bank_data': ('bank-direct-marketing-campaigns.csv', {}),
+    'retail_data': ('marketing_campaign.csv', {'sep': ';'}),
+    'classification_results': ('classification_results_all.csv', {}),
+    'regression_results': ('regression_results_all.csv', {}),
+    'clustering_results': ('clustering_results.csv', {}),
+    'association_rules': ('association_rules.csv', {}),
+    'anomaly_results': ('anomaly_results.csv', {}),
+}
+
+# Columns the dashboard reads from the large customer sources, with compact
+# dtypes; every other column is skipped at parse time. These sources are read
+# in chunks of CSV_CHUNK_ROWS rows with derived columns computed per chunk.
+RETAIL_SPENDING = ['MntWines', 'MntFruits', 'MntMeatProducts', 'MntFishProducts', 'MntSweetProducts', 'MntGoldProds']
+RETAIL_ACCEPTED = ['AcceptedCmp1', 'AcceptedCmp2', 'AcceptedCmp3', 'AcceptedCmp4', 'AcceptedCmp5']
+SOURCE_SCHEMAS = {
+    'bank_data': {'age': 'int8', 'marital': 'category', 'education': 'category', 'y': 'category'},
+    'retail_data': {
+        'ID': 'int32', 'Year_Birth': 'int16', 'Education': 'category', 'Marital_Status': 'category',
+        'Income': 'float64', 'Kidhome': 'int8', 'Dt_Customer': 'category', 'Recency': 'int16',
+        **{c: 'int32' for c in RETAIL_SPENDING},
+        'NumWebPurchases': 'int16', 'NumCatalogPurchases': 'int16', 'NumStorePurchases': 'int16',
+        'NumWebVisitsMonth': 'int16',
+        **{c: 'int8' for c in RETAIL_ACCEPTED}, 'Response': 'int8',
+    },
+}
+CSV_CHUNK_ROWS = int(os.environ.get('DASHBOARD_CSV_CHUNK_ROWS', '500000'))
+
+
+# ============================================================================
+# CSV PARSING + PREPROCESSING
+# ============================================================================
+
+def read_source(name, chunk_func=None, source=True, ingested=True):
+    """A source CSV plus its ingested batches; ``chunk_func`` derives columns per chunk."""
+    path, kwargs = SOURCES[name]
+    files = ([(path, kwargs)] if source else []) + ([(p, {}) for p in ingest_paths(name)] if ingested else [])
+    schema = SOURCE_SCHEMAS.get(name)
+    if schema is None:
+        return pd.concat([pd.read_csv(p, **kw) for p, kw in files], ignore_index=True)
+
+    chunks = []
+    for p, kw in files:
+        for chunk in pd.read_csv(p, usecols=list(schema), dtype=schema, chunksize=CSV_CHUNK_ROWS, **kw):
+            chunks.append(chunk_func(chunk) if chunk_func else chunk)
+    return concat_chunks(chunks)
+
+
+def concat_chunks(chunks):
+    """Concatenate frames, merging categoricals' categories instead of falling back to object."""
+    chunks = [c.copy(deep=False) for c in chunks]
+    for col in chunks[0].columns:
+        dtypes = [c[col].dtype for c in chunks]
+        if all(isinstance(t, pd.CategoricalDtype) for t in dtypes) and len(set(dtypes)) > 1:
+            categories = union_categoricals([pd.Categorical([], dtype=t) for t in dtypes]).categories
+            for c in chunks:
+                c[col] = c[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def apply_schema(name, rows):
+    """Ingested rows restricted and cast to the columns/dtypes a full load produces.
+
+    Raises ValueError when an integer column's values do not survive the cast
+    (fractions, or values out of the dtype's range, which numpy would wrap).
+    """
+    schema = SOURCE_SCHEMAS.get(name)
+    if schema is None:
+        return rows.copy()
+    cast = rows[list(schema)].astype(schema)
+    for col, dtype in schema.items():
+        if pd.api.types.is_integer_dtype(dtype):
+            if not (pd.to_numeric(rows[col]).to_numpy() == cast[col].to_numpy()).all():
+                raise ValueError(f"{col}: values do not fit {dtype}")
+    return cast
+
+
+def source_columns(name):
+    path, kwargs = SOURCES[name]
+    return list(pd.read_csv(path, nrows=0, **kwargs).columns)
+
+
+def ingest_paths(name):
+    directory = os.path.join(INGEST_DIR, name)
+    try:
+        return sorted(os.path.join(directory, n) for n in os.listdir(directory) if n.endswith('.csv'))
+    except OSError:
+        return []
+
+
+def write_batch(name, batch, prepare=None):
+    """Persist a batch of raw source rows; later loads (and other workers) include it.
+
+    The rows are cast to the source's schema and passed through ``prepare``
+    in memory first, and the file is only published once both succeed, so a
+    bad batch never reaches the ingest directory. Returns what ``prepare``
+    returns (the cast rows without one).
+
+    Raises ValueError when the batch lacks any of the source's columns, and
+    ValueError/TypeError/OverflowError when a value does not fit its column.
+    """
+    columns = source_columns(name)
+    missing = [c for c in columns if c not in batch.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    rows = apply_schema(name, batch)
+    prepared = rows if prepare is None else prepare(rows.copy(deep=False))
+    if prepare is not None and name in SOURCE_SCHEMAS:
+        # Values preprocessing fills in (missing incomes) are stored as applied
+        rows = prepared[list(SOURCE_SCHEMAS[name])]
+    directory = os.path.join(INGEST_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        # The cast rows, so every ingested file matches the source schema
+        (batch[columns] if name not in SOURCE_SCHEMAS else rows).to_csv(f, index=False)
+    path = os.path.join(directory, f"{time.time_ns():020d}.csv")
+    os.replace(tmp, path)
+    return prepared
+
+
+AGE_GROUP_EDGES = [30, 40, 50, 60]
+AGE_GROUPS = ['18-29', '30-39', '40-49', '50-59', '60+']
+AGE_GROUP_DTYPE = pd.CategoricalDtype(AGE_GROUPS, ordered=True)
+# Group code of every whole age up to the last edge; a table lookup is several
+# times faster than a binary search per row
+AGE_GROUP_CODES = np.searchsorted(AGE_GROUP_EDGES, np.arange(AGE_GROUP_EDGES[-1] + 1), side='right').astype('int8')
+
+def create_age_group(age):
+    """Age_Group categorical for an array of ages (a label for a scalar age)."""
+    ages = np.clip(age, 0, AGE_GROUP_EDGES[-1]).astype(np.intp)
+    if np.ndim(ages) == 0:
+        return AGE_GROUPS[AGE_GROUP_CODES[ages]]
+    return pd.Categorical.from_codes(AGE_GROUP_CODES.take(ages), dtype=AGE_GROUP_DTYPE)
+
+
+def row_sum(df, columns):
+    """Sum of ``columns`` per row, accumulated in place into a single buffer."""
+    dtype = np.result_type(*(df[col].dtype for col in columns))
+    total = df[columns[0]].to_numpy(dtype=dtype, copy=True)
+    for col in columns[1:]:
+        np.add(total, df[col].to_numpy(), out=total)
+    return total
+
+
+def preprocess_bank(bank_data):
+    bank_data['Response'] = (bank_data['y'] == 'yes').astype('int8')
+    bank_data['Campaign_Type'] = pd.Categorical.from_codes(np.zeros(len(bank_data), dtype='int8'), ['Bank'])
+    bank_data['Age_Group'] = create_age_group(bank_data['age'].to_numpy())
+    return bank_data
+
+
+def preprocess_retail(retail_data, income_fill=None):
+    return fill_income(derive_retail(retail_data), income_fill)
+
+
+def fill_income(retail_data, income_fill=None):
+    # Needs the whole source table's median (source_income_fill), so it runs after
+    # the chunks are combined; ingested batches pass that value instead of their own
+    retail_data['Income'] = pd.to_numeric(retail_data['Income'], errors='coerce')
+    retail_data['Income'] = retail_data['Income'].fillna(retail_data['Income'].median() if income_fill is None else income_fill)
+    retail_data['Income_Level'] = pd.cut(retail_data['Income'],
+                                          bins=[0, 30000, 60000, 100000, float('inf')],
+                                          labels=['Low', 'Medium', 'High', 'Very High'])
+    return retail_data
+
+
+def source_income_fill(source=None):
+    """Fill for missing retail incomes: the median income of the source CSV alone.
+
+    Ingested rows never move it, and their batches are written already filled,
+    so a reload, a live ingest and every worker agree on each row's Income.
+    """
+    if source is None:
+        path, kwargs = SOURCES['retail_data']
+        source = pd.read_csv(path, usecols=['Income'], dtype={'Income': 'float64'}, **kwargs)
+    return float(source['Income'].median())
+
+
+def load_retail():
+    retail_data = read_source('retail_data', derive_retail, ingested=False)
+    income_fill = source_income_fill(retail_data)
+    if ingest_paths('retail_data'):
+        retail_data = concat_chunks([retail_data, read_source('retail_data', derive_retail, source=False)])
+    return fill_income(retail_data, income_fill)
+
+
+def source_file_version(name):
+    """Version token of a source CSV alone, ignoring its ingested batches."""
+    stat = os.stat(SOURCES[name][0])
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def derive_retail(retail_data):
+    # Row-local derived columns, computed per chunk
+    retail_data['Age'] = datetime.now().year - retail_data['Year_Birth']
+    retail_data['Total_Spending'] = row_sum(retail_data, RETAIL_SPENDING)
+    retail_data['Total_Accepted'] = row_sum(retail_data, RETAIL_ACCEPTED + ['Response'])
+    retail_data['Campaign_Type'] = pd.Categorical.from_codes(np.zeros(len(retail_data), dtype='int8'), ['Retail'])
+    retail_data['Age_Group'] = create_age_group(retail_data['Age'].to_numpy())
+    return retail_data
+
+
+def combine(bank_data, retail_data):
+    # Either side may be None when combining a single ingested batch
+    subsets = []
+    if bank_data is not None:
+        bank_subset = bank_data[['age', 'education', 'marital', 'Response', 'Campaign_Type', 'Age_Group']].copy()
+        bank_subset.columns = ['Age', 'Education', 'Marital_Status', 'Response', 'Campaign_Type', 'Age_Group']
+        subsets.append(bank_subset)
+    if retail_data is not None:
+        subsets.append(retail_data[['Age', 'Education', 'Marital_Status', 'Response', 'Campaign_Type', 'Age_Group']].copy())
+    return pd.concat(subsets, ignore_index=True)
+
+
+# name -> (source files the result depends on, builder taking a dataset getter)
+DATASETS = {
+    'bank_data': (['bank_data'], lambda get: read_source('bank_data', preprocess_bank)),
+    'retail_data': (['retail_data'], lambda get: load_retail()),
+    'classification_results': (['classification_results'], lambda get: read_source('classification_results')),
+    'regression_results': (['regression_results'], lambda get: read_source('regression_results')),
+    'clustering_results': (['clustering_results'], lambda get: read_source('clustering_results')),
+    # Itemsets stay as frozenset text here; rule_store.RuleStore parses and indexes them
+    'association_rules': (['association_rules'], lambda get: read_source('association_rules')),
+    'anomaly_results': (['anomaly_results'], lambda get: read_source('anomaly_results')),
+    'combined_data': (['bank_data', 'retail_data'], lambda get: combine(get('bank_data'), get('retail_data'))),
+}
+
+
+# DASHBOARD_RULES=mine derives the rules from marketing_campaign.csv with the
+# bitset Apriori in mining.py instead of reading the association_rules.csv export
+if os.environ.get('DASHBOARD_RULES', 'csv') == 'mine':
+    DATASETS['association_rules'] = (['retail_data'], lambda get: mine_rules(get('retail_data')))
+
+# ============================================================================
+# BINARY SNAPSHOT
+# ============================================================================
+
+def source_fingerprint(sources):
+    """Hash of the source files' size/mtime plus anything else the output depends on."""
+    digest = hashlib.sha1()
+    # Age is derived from the current year, so a new year invalidates the snapshot;
+    # the pandas version guards against unreadable pickles after an upgrade
+    digest.update(f"v{PREPROCESS_VERSION}|{datetime.now().year}|{SNAPSHOT_FORMAT}|{pd.__version__}".encode())
+    for name in sorted(sources):
+        for path in [SOURCES[name][0]] + ingest_paths(name):
+            stat = os.stat(path)
+            digest.update(f"|{name}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def dataset_version(name):
+    """Version token for a dataset; changes whenever one of its sources does."""
+    return source_fingerprint(DATASETS[name][0])
+
+
+def _frame_path(directory, name):
+    return os.path.join(directory, f"{name}.{SNAPSHOT_FORMAT}")
+
+
+def write_columns(df, directory):
+    """Write a frame as one .npy file per column; strings become categorical codes."""
+    os.makedirs(directory)
+    columns = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        entry = {'name': name, 'file': f"{i}.npy"}
+        if pd.api.types.is_numeric_dtype(col.dtype) or pd.api.types.is_bool_dtype(col.dtype):
+            values = col.to_numpy()
+            entry['kind'] = 'numeric'
+        else:
+            cat = col.astype('category').array
+            values = cat.codes
+            entry.update(kind='categorical', categories=cat.categories.tolist(), ordered=bool(cat.ordered))
+        np.save(os.path.join(directory, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+    with open(os.path.join(directory, 'columns.json'), 'w') as f:
+        json.dump({'length': len(df), 'columns': columns}, f)
+
+
+def read_columns(directory, mmap_mode='r'):
+    """Map a frame written by ``write_columns`` without copying the column data."""
+    with open(os.path.join(directory, 'columns.json')) as f:
+        meta = json.load(f)
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode=mmap_mode)
+        if entry['kind'] == 'categorical':
+            dtype = pd.CategoricalDtype(entry['categories'], ordered=entry['ordered'])
+            values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        data[entry['name']] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['length']), copy=False)
+
+
+def write_snapshot(df, directory):
+    # Build in a temp dir and rename into place so concurrently booting
+    # workers never observe a half-written snapshot
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.staging-')
+    try:
+        if SNAPSHOT_FORMAT == 'npy':
+            write_columns(df, _frame_path(staging, 'frame'))
+        elif SNAPSHOT_FORMAT == 'feather':
+            df.to_feather(_frame_path(staging, 'frame'))
+        else:
+            df.to_pickle(_frame_path(staging, 'frame'), protocol=5)
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump({'format': SNAPSHOT_FORMAT, 'rows': len(df)}, f)
+        os.rename(staging, directory)
+    except OSError:
+        # Another worker won the race (or the cache dir is read-only)
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def read_snapshot(directory):
+    if SNAPSHOT_FORMAT == 'npy':
+        return read_columns(_frame_path(directory, 'frame'))
+    if SNAPSHOT_FORMAT == 'feather':
+        return pd.read_feather(_frame_path(directory, 'frame'))
+    return pd.read_pickle(_frame_path(directory, 'frame'))
+
+
+def prune_snapshots(root, keep):
+    for entry in os.listdir(root):
+        if entry != keep and not entry.startswith('.staging-'):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+def snapshots_enabled():
+    return os.environ.get('DASHBOARD_SNAPSHOT', '1') != '0'
+
+
+def load_dataset(name, get, snapshot_dir=SNAPSHOT_DIR, use_snapshot=True):
+    """Return one preprocessed dataset, from its snapshot when it is current.
+
+    ``get`` resolves other datasets a builder depends on (e.g. combined_data).
+    """
+    sources, build = DATASETS[name]
+    if not use_snapshot or not snapshots_enabled():
+        return build(get)
+
+    key = source_fingerprint(sources)
+    directory = os.path.join(snapshot_dir, name, key)
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        try:
+            return read_snapshot(directory)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    df = build(get)
+    write_snapshot(df, directory)
+    prune_snapshots(os.path.join(snapshot_dir, name), keep=key)
+    if SNAPSHOT_FORMAT == 'npy' and os.path.exists(os.path.join(directory, 'manifest.json')):
+        # Map the snapshot just written so this process shares it too
+        return read_snapshot(directory)
+    return df
+
+
+def load_data(use_snapshot=True):
+    """Eagerly load every dataset (benchmarks and offline scripts)."""
+    frames = {}
+    for name in DATASETS:
+        frames[name] = load_dataset(name, frames.__getitem__, use_snapshot=use_snapshot)
+    return frames
+
+
+# ============================================================================
+# LAZY DATA REGISTRY
+# ============================================================================
+
+class DataRegistry:
+    """Named datasets that are loaded on first use, optionally in the background.
+
+    Loaders are zero-argument callables and may call ``get`` for the datasets
+    they depend on. Each dataset has its own lock, so a request for one page's
+    data never waits on an unrelated dataset that is still loading.
+
+    A dataset may also register a ``version`` callable (e.g. its source file
+    fingerprint). Its version is that token plus the versions of every dataset
+    its loader read, so ``refresh`` can drop anything built from a changed CSV.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._version_funcs = {}
+        self._values = {}
+        self._versions = {}
+        self._deps = {}
+        self._errors = {}
+        self._locks = {}
+        self._prefetching = []
+        self._local = threading.local()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name, loader, version=None):
+        self._loaders[name] = loader
+        self._version_funcs[name] = version
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        loading = getattr(self._local, 'loading', None)
+        if loading:
+            loading[-1][1].add(name)  # dependency of the dataset being built
+        if name in self._values:
+            return self._values[name]
+        with self._locks[name]:
+            if name in self._values:
+                return self._values[name]
+            own_version = self._own_version(name)
+            deps = set()
+            self._local.loading = (loading or []) + [(name, deps)]
+            try:
+                value = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = e
+                raise
+            finally:
+                self._local.loading = loading
+            self._errors.pop(name, None)
+            self._deps[name] = sorted(deps)
+            self._versions[name] = (own_version, tuple(self._versions.get(d) for d in self._deps[name]))
+            self._values[name] = value
+            return value
+
+    def _own_version(self, name):
+        func = self._version_funcs[name]
+        if func is None:
+            return None
+        try:
+            return func()
+        except OSError:
+            return None  # missing source; the next load reports the error
+
+    def _current_version(self, name, memo):
+        if name not in memo:
+            memo[name] = (self._own_version(name),
+                          tuple(self._current_version(d, memo) for d in self._deps.get(name, [])))
+        return memo[name]
+
+    def version(self, *names):
+        """Version token of loaded datasets, as recorded when they were built."""
+        return tuple(self._versions.get(name) for name in names)
+
+    def update(self, name, func):
+        """Swap a loaded dataset for ``func(value)`` and record it as current.
+
+        Used for incremental updates. Returns False (doing nothing) when the
+        dataset is not loaded, or was loaded after its sources changed, since
+        it then already holds the new data.
+        """
+        with self._locks[name]:
+            if name not in self._values or self._versions.get(name) == self._current_version(name, {}):
+                return False
+            value = func(self._values[name])
+            self._versions[name] = (self._own_version(name), tuple(self._versions.get(d) for d in self._deps[name]))
+            self._values[name] = value
+            return True
+
+    def refresh(self):
+        """Drop loaded datasets whose sources (or dependencies) changed since they were built.
+
+        Returns the dropped names; the next ``get`` or ``prefetch`` rebuilds them.
+        """
+        memo = {}
+        stale = [name for name in list(self._values)
+                 if self._current_version(name, memo) != self._versions.get(name)]
+        for name in stale:
+            self._values.pop(name, None)
+        return stale
+
+    def status(self, name):
+        if name in self._values:
+            return 'ready'
+        if self._locks[name].locked():
+            return 'loading'
+        if name in self._errors:
+            return 'error'
+        return 'pending'
+
+    def error(self, name):
+        return self._errors.get(name)
+
+    def ready(self, *names):
+        return all(name in self._values for name in names)
+
+    def statuses(self):
+        return {name: self.status(name) for name in self._loaders}
+
+    def prefetch(self, names=None, retry=False):
+        """Load ``names`` (default: everything) in a background thread.
+
+        Datasets whose last load failed are only retried with ``retry=True``.
+        """
+        eligible = ('pending', 'error') if retry else ('pending',)
+        names = [n for n in (names or list(self._loaders)) if self.status(n) in eligible]
+        if not names:
+            return
+        self._prefetching.extend(n for n in names if n not in self._prefetching)
+        threading.Thread(target=self._load_all, args=(names,), daemon=True,
+                         name='data-prefetch').start()
+
+    def _load_all(self, names):
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                pass  # recorded in self._errors and surfaced by status()
+
+    def _after_fork(self):
+        # Background threads do not survive fork(): reset the locks a parent
+        # thread may have held and resume whatever was still being loaded
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        remaining = [n for n in self._prefetching if n not in self._values and n not in self._errors]
+        self._prefetching = []
+        if remaining:
+            self.prefetch(remaining)
+
+
+def register_datasets(registry):
+    for name in DATASETS:
+        registry.register(name, lambda name=name: load_dataset(name, registry.get),
+                          version=lambda name=name: dataset_version(name))
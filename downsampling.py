@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Server-side point reduction for large scatter plots
+
+grid_sample keeps a density-preserving subset of 2D points: every occupied
+grid cell keeps at least one point (so sparse regions and outliers survive)
+and dense cells are thinned in proportion to their share of the data.
+density_grid bins points into a 2D count grid for heatmap rendering.
+"""
+
+import numpy as np
+
+
+def _cells(x, y, grid):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_span = (x.max() - x.min()) or 1.0
+    y_span = (y.max() - y.min()) or 1.0
+    ix = np.minimum(((x - x.min()) / x_span * grid).astype(np.int64), grid - 1)
+    iy = np.minimum(((y - y.min()) / y_span * grid).astype(np.int64), grid - 1)
+    return ix * grid + iy
+
+
+def grid_sample(x, y, max_points, grid=128, seed=0):
+    """Return sorted row indices of at most ~``max_points`` points (all of them if fewer)."""
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    cells = _cells(x, y, grid)
+    ratio = max_points / n
+
+    # Random order within each cell: sort by (cell, random key) and rank
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(n), cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    quota = np.maximum(1, np.floor(counts * ratio)).astype(np.int64)
+    keep = rank < np.repeat(quota, counts)
+    return np.sort(order[keep])
+
+
+def density_grid(x, y, bins=80):
+    """2D counts with bin centers, ready for a heatmap (zero cells are None)."""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    z = counts.T.astype(object)
+    z[counts.T == 0] = None
+    return x_centers, y_centers, z
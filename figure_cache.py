@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+LRU/TTL cache for figures returned by Dash callbacks
+
+Figures are stored as JSON-ready dicts in an in-process LRU, and optionally as
+JSON files in a shared directory so every gunicorn worker benefits from a
+figure any other worker has already built. Keys are hashed tuples, so
+callers include the data version in the key to invalidate on data changes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class FigureCache:
+
+    def __init__(self, maxsize=512, ttl=None, directory=None, max_files=4096):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        self.max_files = max_files
+        self._entries = OrderedDict()  # digest -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        digest = self.digest(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and not self._expired(entry[0]):
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+        value = self._read_file(digest)
+        with self._lock:
+            if value is not None:
+                self.disk_hits += 1
+                self._store(digest, value)
+            else:
+                self.misses += 1
+        return value
+
+    def set(self, key, value):
+        digest = self.digest(key)
+        with self._lock:
+            self._store(digest, value)
+        self._write_file(digest, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries), 'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _store(self, digest, value):
+        self._entries[digest] = (time.time(), value)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    # Shared directory ------------------------------------------------------
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _read_file(self, digest):
+        if not self.directory:
+            return None
+        path = self._path(digest)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_file(self, digest, value):
+        if not self.directory:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f, separators=(',', ':'))
+            os.replace(tmp, self._path(digest))
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._prune_files()
+
+    def _prune_files(self):
+        # Drop the oldest files once the shared directory outgrows max_files
+        try:
+            paths = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith('.json')]
+            if len(paths) <= self.max_files:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_files]:
+                os.remove(path)
+        except OSError:
+            pass
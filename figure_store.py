@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed store of encoded figure JSON
+
+Static figures are serialized and gzip-compressed once, stored under the hash
+of their JSON, and served as-is by a Flask route with that hash as ETag, so a
+revisit costs the browser a 304 instead of the server a re-serialization.
+With a shared directory every gunicorn worker can serve a figure that any
+other worker built.
+
+Pages that embed a digest must stop handing it out once it may be gone:
+``generation`` changes whenever a figure leaves the store (memory eviction,
+or file pruning by any worker sharing the directory), so it belongs in the
+key of anything caching those pages.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class FigureStore:
+
+    def __init__(self, maxsize=256, directory=None, max_files=1024, compresslevel=6):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_files = max_files
+        self.compresslevel = compresslevel
+        self._entries = OrderedDict()  # digest -> gzip-compressed JSON bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, fig):
+        """Store a plotly figure and return its digest."""
+        body = fig.to_json().encode()
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        with self._lock:
+            cached = digest in self._entries
+            if cached:
+                self._entries.move_to_end(digest)
+        if cached:
+            self._touch_file(digest)
+            return digest
+        compressed = gzip.compress(body, compresslevel=self.compresslevel, mtime=0)
+        with self._lock:
+            self._store(digest, compressed)
+        self._write_file(digest, compressed)
+        return digest
+
+    def get(self, digest):
+        """Gzip-compressed JSON for ``digest``, or None if unknown."""
+        with self._lock:
+            compressed = self._entries.get(digest)
+            if compressed is not None:
+                self._entries.move_to_end(digest)
+                return compressed
+        compressed = self._read_file(digest)
+        if compressed is not None:
+            with self._lock:
+                self._store(digest, compressed)
+        return compressed
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': sum(len(v) for v in self._entries.values()),
+                    'generation': list(self.generation)}
+
+    def _store(self, digest, compressed):
+        self._entries[digest] = compressed
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    @property
+    def generation(self):
+        """Token that changes whenever a stored figure may have become unavailable."""
+        return self._evictions, self._prune_mtime()
+
+    # Shared directory ------------------------------------------------------
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json.gz")
+
+    def _marker(self):
+        # Touched by whichever worker prunes, so every worker sees the pruning
+        return os.path.join(self.directory, 'pruned')
+
+    def _prune_mtime(self):
+        if not self.directory:
+            return 0
+        try:
+            return os.stat(self._marker()).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _touch_file(self, digest):
+        # A figure put again is in use again; keep it out of the oldest files pruned first
+        if self.directory:
+            try:
+                os.utime(self._path(digest))
+            except OSError:
+                pass
+
+    def _read_file(self, digest):
+        if not self.directory or not digest.isalnum():
+            return None
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_file(self, digest, compressed):
+        if not self.directory:
+            return
+        if os.path.exists(self._path(digest)):
+            self._touch_file(digest)
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp, self._path(digest))
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._prune_files()
+
+    def _prune_files(self):
+        # Content-addressed files never change; drop the oldest past max_files
+        try:
+            paths = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith('.json.gz')]
+            if len(paths) <= self.max_files:
+                return
+            paths.sort(key=os.path.getmtime)
+            try:
+                for path in paths[:len(paths) - self.max_files]:
+                    os.remove(path)
+            finally:
+                with open(self._marker(), 'a'):
+                    os.utime(self._marker())
+        except OSError:
+            pass
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Bitmap-indexed filtering over categorical columns
+
+Each filter column is stored as categorical codes with one precomputed
+boolean row mask per category value. A filter selection is answered by
+AND-ing those masks (no DataFrame copy, no string comparisons), and the
+charts are fed aggregates computed on the selected rows only.
+
+Histogram columns are binned once with fixed, data-wide edges, so a
+histogram of any selection is a single bincount over precomputed bin codes.
+
+RangeGridIndex answers group + numeric range filters (the Segments page
+sliders) from rows pre-sorted by (group, bucket per range column): a filter
+is a union of contiguous row blocks found with searchsorted, and only rows in
+the partially covered edge buckets are compared against the actual values.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class BitmapIndex:
+
+    def __init__(self, df, filter_columns, group_column, value_columns, histogram_bins=None):
+        self.size = len(df)
+        self.categories = {}
+        self.bitmaps = {}
+        for col in filter_columns + [group_column]:
+            cat = df[col].astype('category')
+            codes = cat.cat.codes.to_numpy()
+            self.categories[col] = list(cat.cat.categories)
+            self.bitmaps[col] = {value: codes == i for i, value in enumerate(self.categories[col])}
+        self.group_column = group_column
+        self.group_codes = df[group_column].astype('category').cat.codes.to_numpy()
+        self.values = {col: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float) for col in value_columns}
+
+        # Per-row bin codes (-1 for missing values) for the fixed-edge histograms
+        self.bin_edges = {}
+        self.bin_codes = {}
+        for col, bins in (histogram_bins or {}).items():
+            edges = fixed_bin_edges(self.values[col], bins)
+            codes = np.searchsorted(edges, self.values[col], side='right') - 1
+            codes = np.minimum(codes, bins - 1)  # the last bin is closed on the right
+            codes[np.isnan(self.values[col])] = -1
+            self.bin_edges[col] = edges
+            self.bin_codes[col] = codes.astype(np.int32)
+
+    def mask(self, filters):
+        """AND the bitmaps of ``{column: value}``; 'All'/None means no filter.
+
+        Returns None when nothing is filtered (i.e. every row is selected).
+        """
+        result = None
+        for col, value in filters.items():
+            if value is None or value == 'All':
+                continue
+            bitmap = self.bitmaps[col].get(value)
+            if bitmap is None:
+                return np.zeros(self.size, dtype=bool)  # unknown value selects nothing
+            result = bitmap.copy() if result is None else np.logical_and(result, bitmap, out=result)
+        return result
+
+    def _select(self, values, mask):
+        return values if mask is None else values[mask]
+
+    def group_counts(self, mask, value_column):
+        """Row counts per (group, value) as ``{group: {value: count}}`` for integer-valued columns."""
+        groups = self._select(self.group_codes, mask)
+        values = self._select(self.values[value_column], mask)
+        valid = (groups >= 0) & ~np.isnan(values)
+        groups, values = groups[valid], values[valid].astype(np.int64)
+        if len(values) == 0:
+            return {}
+        offset = values.min()
+        width = values.max() - offset + 1
+        counts = np.bincount(groups * width + (values - offset),
+                             minlength=len(self.categories[self.group_column]) * width)
+        counts = counts.reshape(-1, width)
+        return {
+            group: {int(v + offset): int(c) for v, c in enumerate(counts[g]) if c}
+            for g, group in enumerate(self.categories[self.group_column]) if counts[g].any()
+        }
+
+    def histogram(self, mask, value_column):
+        """Fixed bin edges plus per-group counts of ``value_column`` over the selected rows."""
+        edges = self.bin_edges[value_column]
+        bins = len(edges) - 1
+        codes = self._select(self.bin_codes[value_column], mask)
+        groups = self._select(self.group_codes, mask)
+        valid = (codes >= 0) & (groups >= 0)
+        n_groups = len(self.categories[self.group_column])
+        counts = np.bincount(groups[valid] * bins + codes[valid], minlength=n_groups * bins).reshape(n_groups, bins)
+        return edges, {
+            group: counts[g] for g, group in enumerate(self.categories[self.group_column]) if counts[g].any()
+        }
+
+
+class RangeGridIndex:
+
+    def __init__(self, df, group_column, steps):
+        """``steps`` maps each range column to its bucket width (the slider step)."""
+        self.size = len(df)
+        self.columns = list(steps)
+        self.steps = np.array([steps[col] for col in self.columns], dtype=float)
+        groups = df[group_column].astype('category')
+        self.group_values = list(groups.cat.categories)
+        self.group_lookup = {value: i for i, value in enumerate(self.group_values)}
+        group_codes = groups.cat.codes.to_numpy().astype(np.int64)
+        values = np.column_stack([pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float) for col in self.columns])
+
+        # Rows with a missing group or value can never match a range filter
+        rows = np.flatnonzero((group_codes >= 0) & ~np.isnan(values).any(axis=1))
+        buckets = np.floor(values[rows] / self.steps).astype(np.int64)
+        self.bucket_min = buckets.min(axis=0) if len(rows) else np.zeros(len(self.columns), dtype=np.int64)
+        buckets -= self.bucket_min
+        self.shape = (max(len(self.group_values), 1),) + tuple(buckets.max(axis=0) + 1 if len(rows) else [1] * len(self.columns))
+
+        keys = np.ravel_multi_index((group_codes[rows],) + tuple(buckets.T), self.shape)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = rows[order]
+        self.values = values[rows][order]
+
+    def select(self, group=None, ranges=None):
+        """Sorted row positions in ``group`` ('All'/None for any) with ``lo <= column <= hi`` for ``ranges``."""
+        ranges = ranges or {}
+        empty = np.empty(0, dtype=np.int64)
+        if group is None or group == 'All':
+            group_codes = np.arange(len(self.group_values))
+        elif group in self.group_lookup:
+            group_codes = np.array([self.group_lookup[group]])
+        else:
+            return empty
+
+        # Bucket span and "fully inside the range" flags per column
+        spans, inside = [group_codes], [np.ones(len(group_codes), dtype=bool)]
+        bounds = []
+        for i, col in enumerate(self.columns):
+            lo, hi = ranges.get(col, (-np.inf, np.inf))
+            first = max(int(np.floor(lo / self.steps[i])) - self.bucket_min[i], 0) if np.isfinite(lo) else 0
+            last = min(int(np.floor(hi / self.steps[i])) - self.bucket_min[i], self.shape[i + 1] - 1) if np.isfinite(hi) else self.shape[i + 1] - 1
+            if first > last:
+                return empty
+            span = np.arange(first, last + 1)
+            start = (span + self.bucket_min[i]) * self.steps[i]
+            spans.append(span)
+            inside.append((start >= lo) & (start + self.steps[i] <= hi))
+            bounds.append((lo, hi))
+
+        # One block of rows per (group, bucket...) cell
+        cells = np.meshgrid(*spans, indexing='ij')
+        keys = np.ravel_multi_index(tuple(c.ravel() for c in cells), self.shape)
+        exact = ~np.logical_and.reduce(np.meshgrid(*inside, indexing='ij')).ravel()
+        starts = np.searchsorted(self.keys, keys, side='left')
+        lengths = np.searchsorted(self.keys, keys, side='right') - starts
+        total = lengths.sum()
+        if total == 0:
+            return empty
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+        # Only rows from edge buckets are compared against the actual values
+        check = np.flatnonzero(np.repeat(exact, lengths))
+        if len(check):
+            values = self.values[positions[check]]
+            ok = np.ones(len(check), dtype=bool)
+            for i, (lo, hi) in enumerate(bounds):
+                ok &= (values[:, i] >= lo) & (values[:, i] <= hi)
+            keep = np.ones(total, dtype=bool)
+            keep[check[~ok]] = False
+            positions = positions[keep]
+        return np.sort(self.rows[positions])
+
+
+def fixed_bin_edges(values, bins):
+    """``bins`` equal-width bins with integer edges spanning every non-missing value."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.arange(bins + 1, dtype=float)
+    lo, hi = np.floor(values.min()), np.ceil(values.max())
+    width = max(1.0, np.ceil((hi - lo + 1) / bins))
+    return lo + width * np.arange(bins + 1)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Per-callback latency and payload metrics in Prometheus text format
+
+Every Dash callback request is timed (wall clock and the handling thread's
+CPU time) and sized (response body before compression), labelled by the
+callback function and the page it was fired from. Callbacks report how many
+rows they processed with ``add_rows`` and page layouts are timed with
+``timer``. Observations go into streaming log-bucketed histograms, so
+p50/p95/p99 are available at any time in constant memory, and ``/metrics``
+serves them as Prometheus summaries.
+
+When disabled no request hooks or routes are installed and ``add_rows`` /
+``timer`` return immediately.
+"""
+
+import copy
+import math
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+import numpy as np
+from flask import Response, request
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+FAMILIES = {
+    'callback_wall_seconds': 'Wall-clock time of a Dash callback request',
+    'callback_cpu_seconds': 'CPU time of the thread handling a Dash callback request',
+    'callback_response_bytes': 'Dash callback response body size before compression',
+    'callback_rows': 'Rows processed by a Dash callback',
+    'page_layout_wall_seconds': 'Wall-clock time to build a page layout (layout cache misses)',
+    'page_layout_cpu_seconds': 'CPU time to build a page layout (layout cache misses)',
+}
+
+
+class LogHistogram:
+    """Streaming histogram with geometric buckets; quantiles are within ``relative_error``."""
+
+    def __init__(self, relative_error=0.01):
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count; bucket i holds (gamma^(i-1), gamma^i]
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value <= 0:
+            self.zeros += 1
+            return
+        i = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def observe_array(self, values, weight=1):
+        """``observe`` every value, each counted ``weight`` times (e.g. a sample standing in for a population)."""
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.count += weight * len(values)
+        self.sum += weight * float(values.sum())
+        self.zeros += weight * (len(values) - len(positive))
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for i, n in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[i] = self.buckets.get(i, 0) + weight * n
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.buckets = dict(self.buckets)
+        return clone
+
+    def quantile(self, q):
+        if not self.count:
+            return float('nan')
+        # Nearest rank: the smallest bucket holding at least q of the observations
+        rank = max(1, math.ceil(q * self.count))
+        seen = self.zeros
+        if seen >= rank:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                break
+        return 2 * self.gamma ** i / (self.gamma + 1)
+
+
+def is_callback_request():
+    """Whether the current Flask request is a Dash callback."""
+    return request.path.rsplit('/', 1)[-1] == '_dash-update-component'
+
+
+def callback_name(app, payload=None):
+    """Python function name of the callback the current request runs ('unknown' when none matches)."""
+    # Callback requests name their outputs, which key app.callback_map
+    if payload is None:
+        payload = request.get_json(silent=True) or {}
+    entry = app.callback_map.get(payload.get('output'), {})
+    return entry['callback'].__name__ if 'callback' in entry else 'unknown'
+
+
+class Metrics:
+
+    def __init__(self, enabled=False, namespace='dashboard'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._histograms = {}  # (family, sorted label items) -> LogHistogram
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, family, labels, value):
+        key = (family, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LogHistogram()
+            histogram.observe(value)
+
+    def add_rows(self, n):
+        """Count rows processed by the callback handling the current request."""
+        if not self.enabled:
+            return
+        state = getattr(self._local, 'request', None)
+        if state is not None:
+            state[2] += int(n)
+
+    def timer(self, prefix, **labels):
+        """Context manager recording ``<prefix>_wall_seconds`` and ``<prefix>_cpu_seconds``."""
+        if not self.enabled:
+            return nullcontext()
+        return _Timer(self, prefix, labels)
+
+    # Dash integration ------------------------------------------------------
+
+    def instrument(self, app, pages):
+        """Time every callback request of ``app`` and serve ``/metrics``; ``pages`` bounds the page label."""
+        if not self.enabled:
+            return
+        pages = set(pages)
+        server = app.server
+
+        @server.before_request
+        def start_callback_timer():
+            if is_callback_request():
+                self._local.request = [time.perf_counter(), time.thread_time(), 0]
+
+        @server.after_request
+        def record_callback(response):
+            state = getattr(self._local, 'request', None)
+            if state is None or not is_callback_request():
+                return response
+            self._local.request = None
+            wall, cpu = time.perf_counter() - state[0], time.thread_time() - state[1]
+            page = urlparse(request.referrer or '').path
+            labels = {'callback': callback_name(app), 'page': page if page in pages else 'other'}
+            self.observe('callback_wall_seconds', labels, wall)
+            self.observe('callback_cpu_seconds', labels, cpu)
+            self.observe('callback_rows', labels, state[2])
+            if not response.direct_passthrough:
+                self.observe('callback_response_bytes', labels, len(response.get_data()))
+            return response
+
+        @server.route('/metrics')
+        def prometheus_metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    # Prometheus text format ------------------------------------------------
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted(self._histograms.items(), key=lambda item: item[0])
+            lines = []
+            family = None
+            for (name, labels), histogram in snapshot:
+                metric = f"{self.namespace}_{name}"
+                if name != family:
+                    family = name
+                    lines.append(f"# HELP {metric} {FAMILIES.get(name, name)}")
+                    lines.append(f"# TYPE {metric} summary")
+                for q in QUANTILES:
+                    lines.append(f"{metric}{_labels(labels + (('quantile', str(q)),))} {histogram.quantile(q):.6g}")
+                lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum:.6g}")
+                lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class _Timer:
+
+    def __init__(self, metrics, prefix, labels):
+        self.metrics = metrics
+        self.prefix = prefix
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = (time.perf_counter(), time.thread_time())
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(f"{self.prefix}_wall_seconds", self.labels, time.perf_counter() - self.start[0])
+        self.metrics.observe(f"{self.prefix}_cpu_seconds", self.labels, time.thread_time() - self.start[1])
+        return False
+
+
+def _labels(items):
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
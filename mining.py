@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Association-rule mining for the Pattern Mining page
+
+Regenerates association_rules.csv from the retail customer table:
+customers are discretized into items (tertiles of income, recency, total
+spending, web purchases, engagement and customer seniority, plus the
+campaign response), frequent itemsets are mined with a bitset Apriori, and
+rules are written in the antecedents/consequents/support/confidence/lift
+schema the dashboard reads.
+
+Every item is a packed bitset over customers, so the support of a candidate
+itemset is the popcount of the AND of its items' bitsets. Candidates of a
+level are counted in batches, optionally spread over worker processes.
+
+    python mining.py                                 # rewrite association_rules.csv
+    python mining.py --min-support 0.1 --processes 4 --output rules.csv
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+TERTILE_LABELS = ['Low', 'Med', 'High']
+
+# Candidates counted per batch (bounds the temporary bitset memory)
+BATCH_SIZE = 4096
+
+
+# ============================================================================
+# DISCRETIZATION
+# ============================================================================
+
+def tertiles(values):
+    """Low/Med/High by equal-frequency bins (fewer labels when ties collapse bins)."""
+    codes = pd.qcut(values, 3, labels=False, duplicates='drop')
+    n_bins = int(np.nanmax(codes)) + 1 if codes.notna().any() else 1
+    return pd.Categorical.from_codes(codes.fillna(-1).astype(int), TERTILE_LABELS[:n_bins])
+
+
+def discretize(retail_data):
+    """One categorical column per feature; a customer's items are its non-missing values."""
+    joined = pd.to_datetime(retail_data['Dt_Customer'].astype(str), errors='coerce')
+    engagement = retail_data[['NumWebPurchases', 'NumCatalogPurchases', 'NumStorePurchases', 'NumWebVisitsMonth']].sum(axis=1)
+    return pd.DataFrame({
+        'Customer_Seniority': tertiles((joined.max() - joined).dt.days),
+        'Engagement_Score': tertiles(engagement),
+        'Income': tertiles(retail_data['Income']),
+        'NumWebPurchases': tertiles(retail_data['NumWebPurchases']),
+        'Recency': tertiles(retail_data['Recency']),
+        'Response': pd.Categorical(retail_data['Response'].astype(int)),
+        'Total_Spent': tertiles(retail_data['Total_Spending']),
+    })
+
+
+def item_bitsets(features):
+    """Item names, their feature index and packed bitsets (one row of bytes per item)."""
+    names, groups, rows = [], [], []
+    for g, (feature, col) in enumerate(features.items()):
+        codes = col.cat.codes.to_numpy()
+        for code, value in enumerate(col.cat.categories):
+            names.append(f"{feature}_{value}")
+            groups.append(g)
+            rows.append(codes == code)
+    bits = np.packbits(np.array(rows, dtype=bool).reshape(len(rows), -1), axis=1)
+    # Pad to whole 64-bit words so popcounts run over uint64
+    pad = (-bits.shape[1]) % 8
+    bits = np.pad(bits, ((0, 0), (0, pad))).view(np.uint64)
+    return names, np.array(groups), bits
+
+
+# ============================================================================
+# BITSET APRIORI
+# ============================================================================
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return _POPCOUNT8[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+_worker_bits = None
+
+def _init_worker(bits):
+    global _worker_bits
+    _worker_bits = bits
+
+
+def _count(bits, candidates):
+    acc = bits[candidates[:, 0]]
+    for col in range(1, candidates.shape[1]):
+        acc = acc & bits[candidates[:, col]]
+    return _popcount(acc)
+
+
+def _count_in_worker(candidates):
+    return _count(_worker_bits, candidates)
+
+
+def _join(frequent, groups):
+    """Apriori candidates of size k+1 from the sorted frequent k-itemsets."""
+    f, k = frequent.shape
+    if f < 2:
+        return np.empty((0, k + 1), dtype=frequent.dtype)
+    # Itemsets sharing their first k-1 items form contiguous runs; pair each with those after it
+    if k == 1:
+        run_start = np.array([0])
+    else:
+        run_start = np.flatnonzero(np.r_[True, (frequent[1:, :k - 1] != frequent[:-1, :k - 1]).any(axis=1)])
+    run_end = np.r_[run_start[1:], f]
+    end_of = np.repeat(run_end, run_end - run_start)
+    partners = end_of - np.arange(f) - 1
+    left = np.repeat(np.arange(f), partners)
+    right = left + 1 + (np.arange(partners.sum()) - np.repeat(np.cumsum(partners) - partners, partners))
+    # Items of one feature are mutually exclusive, so never pair them
+    keep = groups[frequent[left, -1]] != groups[frequent[right, -1]]
+    left, right = left[keep], right[keep]
+    candidates = np.column_stack([frequent[left], frequent[right, -1]])
+
+    if k > 1:
+        # Prune candidates with an infrequent k-subset (dropping one of the shared prefix items)
+        known = set(map(tuple, frequent.tolist()))
+        keep = [all(tuple(c[:i] + c[i + 1:]) in known for i in range(k - 1)) for c in candidates.tolist()]
+        candidates = candidates[np.array(keep, dtype=bool)]
+    return candidates
+
+
+def frequent_itemsets(bits, groups, n_rows, min_support=0.05, max_len=None, processes=1):
+    """``{itemset tuple: support count}`` for every itemset with support >= min_support."""
+    min_count = int(np.ceil(min_support * n_rows - 1e-9))
+    counts = _popcount(bits)
+    frequent = np.flatnonzero(counts >= min_count).reshape(-1, 1)
+    result = {(int(i),): int(counts[i]) for i in frequent[:, 0]}
+
+    pool = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(bits,)) if processes > 1 else None
+    try:
+        k = 1
+        while len(frequent) > 1 and (max_len is None or k < max_len):
+            candidates = _join(frequent, groups)
+            if len(candidates) == 0:
+                break
+            chunk = BATCH_SIZE if pool is None else max(1, min(BATCH_SIZE, -(-len(candidates) // processes)))
+            batches = [candidates[i:i + chunk] for i in range(0, len(candidates), chunk)]
+            counted = pool.map(_count_in_worker, batches) if pool is not None else (_count(bits, b) for b in batches)
+            support = np.concatenate(list(counted))
+            passed = support >= min_count
+            frequent = candidates[passed]
+            result.update(zip(map(tuple, frequent.tolist()), support[passed].tolist()))
+            k += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return result
+
+
+# ============================================================================
+# RULES
+# ============================================================================
+
+def _itemset_text(names, itemset):
+    return 'frozenset({' + ', '.join(f"'{names[i]}'" for i in itemset) + '})'
+
+
+def association_rules(itemsets, names, n_rows, min_confidence=0.0, min_lift=1.0):
+    """Every antecedent -> consequent split of the frequent itemsets, as the dashboard's rule schema."""
+    rows = []
+    for itemset, count in itemsets.items():
+        for size in range(1, len(itemset)):
+            for antecedent in itertools.combinations(itemset, size):
+                consequent = tuple(i for i in itemset if i not in antecedent)
+                confidence = count / itemsets[antecedent]
+                lift = confidence / (itemsets[consequent] / n_rows)
+                if confidence >= min_confidence and lift >= min_lift:
+                    rows.append((antecedent, consequent, count / n_rows, confidence, lift))
+    return pd.DataFrame({
+        'antecedents': [_itemset_text(names, r[0]) for r in rows],
+        'consequents': [_itemset_text(names, r[1]) for r in rows],
+        'support': [r[2] for r in rows],
+        'confidence': [r[3] for r in rows],
+        'lift': [r[4] for r in rows],
+    })
+
+
+def mine_rules(retail_data, min_support=0.05, min_confidence=0.0, min_lift=1.0, max_len=None, processes=1):
+    names, groups, bits = item_bitsets(discretize(retail_data))
+    n_rows = len(retail_data)
+    itemsets = frequent_itemsets(bits, groups, n_rows, min_support=min_support, max_len=max_len, processes=processes)
+    return association_rules(itemsets, names, n_rows, min_confidence=min_confidence, min_lift=min_lift)
+
+
+if __name__ == '__main__':
+    from data_loader import DATASETS
+
+    parser = argparse.ArgumentParser(description="Regenerate association rules from marketing_campaign.csv")
+    parser.add_argument('--min-support', type=float, default=0.05)
+    parser.add_argument('--min-confidence', type=float, default=0.0)
+    parser.add_argument('--min-lift', type=float, default=1.0)
+    parser.add_argument('--max-len', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=1, help=f"worker processes (this machine: {os.cpu_count()})")
+    parser.add_argument('--output', default='association_rules.csv')
+    args = parser.parse_args()
+
+    retail_data = DATASETS['retail_data'][1](None)
+    rules = mine_rules(retail_data, min_support=args.min_support, min_confidence=args.min_confidence,
+                       min_lift=args.min_lift, max_len=args.max_len, processes=args.processes)
+    rules.to_csv(args.output, index=False)
+    print(f"{len(rules):,} rules from {len(retail_data):,} customers -> {args.output}")
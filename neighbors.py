@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Nearest-neighbour lookup for the Live Prediction page
+
+``KDTree`` is a static k-d tree over an (n, d) array of points, built once
+when its dataset loads. Nodes live in flat arrays; points are copied into
+tree order so every leaf is a contiguous slice scanned with one vectorized
+distance computation. A query walks the tree depth-first, nearer child first,
+and skips any subtree whose splitting plane is farther than the k-th best
+distance found so far.
+"""
+
+import numpy as np
+
+LEAF_SIZE = 64
+# Up to this many points one vectorized scan beats walking a tree, so they stay a single leaf
+SCAN_ROWS = 8192
+
+
+class KDTree:
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        # Coordinates are kept one contiguous row per dimension (fast per-node
+        # min/max) and reordered in place, with their original rows, as nodes split
+        columns = np.array(np.asarray(points, dtype=float).T, order='C')
+        n = columns.shape[1]
+        order = np.arange(n)
+        start, end, dim, split, left = [], [], [], [], []
+
+        def add_node(lo, hi):
+            start.append(lo)
+            end.append(hi)
+            dim.append(-1)
+            split.append(0.0)
+            left.append(-1)
+            return len(start) - 1
+
+        if n:
+            add_node(0, n)
+        stack = [0] if n > SCAN_ROWS else []
+        while stack:
+            node = stack.pop()
+            lo, hi = start[node], end[node]
+            if hi - lo <= leaf_size:
+                continue
+            members = columns[:, lo:hi]
+            d = int(np.argmax(members.max(axis=1) - members.min(axis=1)))
+            mid = (hi - lo) // 2
+            # Median split on the widest dimension; the right child follows the left
+            part = np.argpartition(members[d], mid)
+            columns[:, lo:hi] = members[:, part]
+            order[lo:hi] = order[lo:hi][part]
+            dim[node], split[node] = d, columns[d, lo + mid]
+            left[node] = add_node(lo, lo + mid)
+            add_node(lo + mid, hi)
+            stack.extend((left[node], left[node] + 1))
+
+        self.index = order      # tree position -> original row
+        self.columns = columns  # (d, n) coordinates in tree order
+        self.start = np.array(start, dtype=np.intp)
+        self.end = np.array(end, dtype=np.intp)
+        self.dim = np.array(dim, dtype=np.intp)
+        self.split = np.array(split)
+        self.left = np.array(left, dtype=np.intp)
+        # Plain-list copies keep the per-node work of a query in Python scalars
+        self._nodes = (dim, split, left, start, end)
+
+    def __len__(self):
+        return self.columns.shape[1]
+
+    def query(self, point, k=10):
+        """``(rows, distances)`` of the ``k`` points nearest ``point``, nearest first."""
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self))
+        best = np.empty(0, dtype=np.intp)
+        best_sq = np.empty(0)
+        worst = np.inf
+        dim, split, left, start, end = self._nodes
+        coords = point.tolist()
+        stack = [(0, 0.0)] if len(self) else []
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+            d = dim[node]
+            if d < 0:
+                lo, hi = start[node], end[node]
+                sq = ((self.columns[:, lo:hi] - point[:, None]) ** 2).sum(axis=0)
+                best = np.concatenate([best, np.arange(lo, hi)])
+                best_sq = np.concatenate([best_sq, sq])
+                if len(best) > k:
+                    keep = np.argpartition(best_sq, k - 1)[:k]
+                    best, best_sq = best[keep], best_sq[keep]
+                if len(best) == k:
+                    worst = best_sq.max()
+                continue
+            diff = coords[d] - split[node]
+            near, far = (left[node], left[node] + 1) if diff < 0 else (left[node] + 1, left[node])
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        order = np.argsort(best_sq, kind='stable')
+        return self.index[best[order]], np.sqrt(best_sq[order])
+
+
+def brute_force_query(points, point, k=10):
+    """The same result as ``KDTree.query`` by scanning every point."""
+    sq = ((np.asarray(points, dtype=float) - point) ** 2).sum(axis=1)
+    k = min(k, len(sq))
+    nearest = np.argpartition(sq, k - 1)[:k] if k < len(sq) else np.arange(len(sq))
+    nearest = nearest[np.argsort(sq[nearest], kind='stable')]
+    return nearest, np.sqrt(sq[nearest])
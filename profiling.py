@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiling of slow Dash callbacks
+
+Two kinds of capture, each saved with the callback's inputs and state so a
+slow call can be replayed:
+
+* Every callback request is watched by a low-rate stack sampler (one thread
+  that walks the request thread's stack every ``interval`` seconds while a
+  callback is in flight). Calls slower than ``threshold`` keep their samples
+  as a folded-stack flamegraph (``.folded``, for flamegraph.pl/speedscope);
+  faster calls discard them.
+* A ``sample_rate`` fraction of calls runs under cProfile instead and is
+  always kept (``.prof``, for pstats/snakeviz).
+
+Captures go to a local directory holding at most ``max_captures`` of them
+(oldest removed first); ``captures()`` lists them slowest first for the
+admin page. Captures hold raw callback inputs, so the admin page and files
+are only served when ``admin_token`` is set, and every request for them must
+carry it (``authorized()``).
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from flask import request
+
+from metrics import callback_name, is_callback_request
+
+# Inputs larger than this are truncated in the capture
+MAX_INPUT_BYTES = 64 * 1024
+MAX_STACK_DEPTH = 128
+# Set once the admin page is opened with ?token=, so its callbacks and capture links carry it
+ADMIN_COOKIE = 'dashboard_admin_token'
+
+
+class StackSampler:
+    """Folded stacks of registered threads, sampled by one daemon thread only while any are registered."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, ident):
+        with self._lock:
+            self._active[ident] = Counter()
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='stack-sampler')
+                self._thread.start()
+
+    def stop(self, ident):
+        with self._lock:
+            return self._active.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                for ident, counts in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counts[fold_stack(frame)] += 1
+
+
+def fold_stack(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class CallbackProfiler:
+
+    def __init__(self, directory, enabled=False, threshold=1.0, sample_rate=0.0, max_captures=200, interval=0.01,
+                 admin_token=None):
+        self.directory = directory
+        self.enabled = enabled
+        self.admin_token = admin_token or None
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.max_captures = max_captures
+        self.sampler = StackSampler(interval)
+        self._local = threading.local()
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def instrument(self, app):
+        """Watch every callback request of ``app``."""
+        if not self.enabled:
+            return
+        server = app.server
+
+        @server.before_request
+        def start_callback_profile():
+            if not is_callback_request():
+                return
+            profile = None
+            if self.sample_rate and random.random() < self.sample_rate:
+                profile = cProfile.Profile()
+                profile.enable()
+            else:
+                self.sampler.start(threading.get_ident())
+            self._local.call = (time.perf_counter(), time.thread_time(), profile)
+
+        @server.after_request
+        def finish_callback_profile(response):
+            call = getattr(self._local, 'call', None)
+            if call is None or not is_callback_request():
+                return response
+            self._local.call = None
+            start, cpu_start, profile = call
+            if profile is not None:
+                profile.disable()
+            else:
+                samples = self.sampler.stop(threading.get_ident())
+            wall, cpu = time.perf_counter() - start, time.thread_time() - cpu_start
+            if profile is not None or wall >= self.threshold:
+                self._save(app, wall, cpu, profile, None if profile is not None else samples)
+            return response
+
+        @server.teardown_request
+        def discard_callback_profile(exc):
+            # after_request is skipped when the request fails; don't leave the thread registered
+            call = getattr(self._local, 'call', None)
+            if call is None:
+                return
+            self._local.call = None
+            if call[2] is not None:
+                call[2].disable()
+            else:
+                self.sampler.stop(threading.get_ident())
+
+    # Admin access -----------------------------------------------------------
+
+    @property
+    def admin_enabled(self):
+        """Captures hold raw callback inputs, so they are only served with an admin token configured."""
+        return self.enabled and self.admin_token is not None
+
+    def authorized(self):
+        """Whether the current request carries the admin token (X-Admin-Token, bearer, ``?token=`` or cookie)."""
+        if not self.admin_enabled:
+            return False
+        bearer = request.headers.get('Authorization', '')
+        candidates = [request.headers.get('X-Admin-Token'), request.args.get('token'),
+                      request.cookies.get(ADMIN_COOKIE), bearer[7:] if bearer.startswith('Bearer ') else None]
+        return any(c and hmac.compare_digest(c.encode(), self.admin_token.encode()) for c in candidates)
+
+    # Captures ---------------------------------------------------------------
+
+    def _save(self, app, wall, cpu, profile, samples):
+        payload = request.get_json(silent=True) or {}
+        inputs = {'inputs': payload.get('inputs'), 'state': payload.get('state')}
+        encoded = json.dumps(inputs, default=str)
+        if len(encoded) > MAX_INPUT_BYTES:
+            inputs = {'truncated': encoded[:MAX_INPUT_BYTES]}
+        name = f"{time.time_ns():020d}-{os.getpid()}"
+        meta = {
+            'name': name, 'time': time.time(), 'callback': callback_name(app, payload),
+            'page': request.referrer, 'wall_seconds': wall, 'cpu_seconds': cpu,
+            'trigger': 'sampled' if profile is not None else 'threshold', **inputs,
+        }
+        if profile is not None:
+            meta['kind'], meta['top'] = 'cprofile', top_functions(profile)
+            self._write(name + '.prof', lambda f: f.write(profile_bytes(profile)))
+        else:
+            meta['kind'], meta['samples'] = 'stacks', sum(samples.values())
+            meta['top'] = top_frames(samples)
+            folded = ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+            self._write(name + '.folded', lambda f: f.write(folded.encode()))
+        self._write(name + '.json', lambda f: f.write(json.dumps(meta, default=str).encode()))
+        self._prune()
+
+    def _write(self, filename, write):
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, os.path.join(self.directory, filename))
+        except OSError:
+            pass
+
+    def _prune(self):
+        # Capture names start with a timestamp, so sorting them is oldest first
+        try:
+            names = sorted(n[:-5] for n in os.listdir(self.directory) if n.endswith('.json'))
+            for name in names[:max(0, len(names) - self.max_captures)]:
+                for suffix in ('.json', '.prof', '.folded'):
+                    path = os.path.join(self.directory, name + suffix)
+                    if os.path.exists(path):
+                        os.remove(path)
+        except OSError:
+            pass
+
+    def captures(self, limit=50):
+        """Capture metadata, slowest first."""
+        result = []
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.json')]
+        except OSError:
+            return result
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        result.sort(key=lambda c: c.get('wall_seconds', 0), reverse=True)
+        return result[:limit]
+
+    def capture_path(self, filename):
+        """Path of a capture file, or None for anything that is not one."""
+        if os.path.basename(filename) != filename or not filename.endswith(('.json', '.prof', '.folded')):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.exists(path) else None
+
+
+def profile_bytes(profile):
+    # The format pstats.Stats.dump_stats writes, built in memory
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def top_functions(profile, n=10):
+    """``[(function, seconds)]`` for the functions with the most own (non-child) time."""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:n]
+    return [(f"{func} ({os.path.basename(path)}:{line})", tottime) for (path, line, func), (_, _, tottime, _, _) in rows]
+
+
+def top_frames(samples, n=10):
+    """``[(frame, fraction of samples)]`` for the frames most often at the top of the stack."""
+    total = sum(samples.values())
+    if not total:
+        return []
+    leaves = Counter()
+    for stack, count in samples.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    return [(frame, count / total) for frame, count in leaves.most_common(n)]
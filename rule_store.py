@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Parsed, indexed association rules
+
+Antecedent and consequent itemsets are parsed from their ``frozenset({...})``
+text into integer item IDs stored CSR-style (one flat code array plus row
+offsets). For every item there is a posting list of the rules holding it on
+each side, pre-sorted by each metric, and there is a global pre-sorted order
+per metric. "Rules with item X ranked by lift, lift >= t" is then a slice of
+one posting list found by binary search instead of a scan over every rule.
+"""
+
+import numpy as np
+import pandas as pd
+
+METRICS = ('support', 'confidence', 'lift')
+SIDES = ('antecedents', 'consequents')
+
+
+def parse_itemsets(values):
+    """Item counts per row and the flat item labels of ``frozenset({'a', 'b'})`` strings."""
+    text = pd.Series(values).astype(str).str.removeprefix('frozenset({').str.removesuffix('})')
+    parts = text.str.split(', ')
+    lengths = parts.str.len().to_numpy(dtype=np.int64)
+    labels = parts.explode().str.strip("'\"").to_numpy(dtype=object)
+    return lengths, labels
+
+
+class RuleStore:
+
+    def __init__(self, rules):
+        """``rules`` has antecedents, consequents, support, confidence and lift columns."""
+        self.size = len(rules)
+        self.metrics = {m: pd.to_numeric(rules[m], errors='coerce').to_numpy(dtype=float) for m in METRICS}
+
+        lengths, labels = {}, {}
+        for side in SIDES:
+            lengths[side], labels[side] = parse_itemsets(rules[side])
+        codes, items = pd.factorize(np.concatenate([labels[s] for s in SIDES]), sort=True)
+        self.items = np.asarray(items, dtype=object)
+        self.item_ids = {item: i for i, item in enumerate(self.items)}
+
+        # CSR itemsets: rule r holds codes[side][offsets[side][r]:offsets[side][r + 1]]
+        self.offsets, self.codes = {}, {}
+        split = len(labels[SIDES[0]])
+        for side, side_codes in zip(SIDES, (codes[:split], codes[split:])):
+            self.offsets[side] = np.concatenate([[0], np.cumsum(lengths[side])])
+            self.codes[side] = side_codes.astype(np.int32)
+
+        # Global order and per-item posting lists, each sorted by metric (descending, ties by rule
+        # ID) and stored with their negated metric values so a threshold is one binary search.
+        # The global orders also keep the other metrics in rank order, so secondary thresholds
+        # over every rule are contiguous comparisons instead of random gathers
+        rule_ids = np.arange(self.size)
+        self.order, self.ranked_metrics = {}, {}
+        for m in METRICS:
+            order = np.lexsort((rule_ids, -self._sort_key(m)))
+            self.order[m] = (order.astype(np.int32), -self._sort_key(m)[order])
+            self.ranked_metrics[m] = {other: self.metrics[other][order] for other in METRICS if other != m}
+        self.postings = {}
+        for side in SIDES:
+            rules_of = np.repeat(rule_ids, np.diff(self.offsets[side]))
+            item_codes = self.codes[side]
+            for m in METRICS:
+                order = np.lexsort((rules_of, -self._sort_key(m)[rules_of], item_codes))
+                bounds = np.searchsorted(item_codes[order], np.arange(len(self.items) + 1))
+                self.postings[side, m] = (bounds, rules_of[order].astype(np.int32), -self._sort_key(m)[rules_of[order]])
+
+    def __len__(self):
+        return self.size
+
+    def _sort_key(self, metric):
+        # Missing metrics sort last and never pass a threshold
+        return np.nan_to_num(self.metrics[metric], nan=-np.inf)
+
+    def _ranked(self, metric, side=None, item=None):
+        """Rule IDs ranked by ``metric`` and their negated metric values."""
+        if side is None:
+            return self.order[metric]
+        bounds, rules, keys = self.postings[side, metric]
+        code = self.item_ids.get(item)
+        if code is None:
+            return rules[:0], keys[:0]
+        return rules[bounds[code]:bounds[code + 1]], keys[bounds[code]:bounds[code + 1]]
+
+    def query(self, antecedent=None, consequent=None, min_support=0.0, min_confidence=0.0, min_lift=0.0,
+              sort_by='lift', offset=0, limit=10):
+        """One page of rule IDs ranked by ``sort_by`` (descending) plus the number of matching rules.
+
+        ``antecedent``/``consequent`` restrict to rules holding that item on that side.
+        """
+        if antecedent is not None:
+            ranked, keys = self._ranked(sort_by, 'antecedents', antecedent)
+            if consequent is not None:
+                both = np.isin(ranked, self._ranked(sort_by, 'consequents', consequent)[0])
+                ranked, keys = ranked[both], keys[both]
+        elif consequent is not None:
+            ranked, keys = self._ranked(sort_by, 'consequents', consequent)
+        else:
+            ranked, keys = self._ranked(sort_by)
+
+        # The ranking metric's threshold cuts a prefix; the others filter what is left
+        minimums = {'support': min_support, 'confidence': min_confidence, 'lift': min_lift}
+        end = np.searchsorted(keys, -(minimums.pop(sort_by) or 0.0), side='right')
+        ranked = ranked[:end]
+        unfiltered = antecedent is None and consequent is None
+        keep = None
+        for metric, minimum in minimums.items():
+            if minimum:
+                values = self.ranked_metrics[sort_by][metric][:end] if unfiltered else self.metrics[metric][ranked]
+                passed = values >= minimum
+                keep = passed if keep is None else keep & passed
+        if keep is not None:
+            ranked = ranked[keep]
+        return ranked[offset:offset + limit], len(ranked)
+
+    def top(self, metric, k):
+        return self.query(sort_by=metric, limit=k)[0]
+
+    def itemset_labels(self, side, rule_ids):
+        offsets, codes = self.offsets[side], self.codes[side]
+        return [', '.join(self.items[codes[offsets[r]:offsets[r + 1]]]) for r in rule_ids]
+
+    def frame(self, rule_ids):
+        """The selected rules with flat ``a, b`` itemset labels, in the given order."""
+        rule_ids = np.asarray(rule_ids, dtype=np.int64)
+        return pd.DataFrame({
+            'antecedents': self.itemset_labels('antecedents', rule_ids),
+            'consequents': self.itemset_labels('consequents', rule_ids),
+            **{m: self.metrics[m][rule_ids] for m in METRICS},
+        })